@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the HTTP/2 backend against a pool of HTTP/1.1 connections.
+
+Two local stand-ins for the GTEx API answer every request after a fixed
+latency,
+and accept only a limited number of concurrent connections from a client,
+as public APIs do.
+The first speaks HTTP/1.1 and is queried through a shared
+``requests.Session`` whose pool keeps as many keep-alive connections as the
+server allows,
+the best HTTP/1.1 can do under the limit.
+The second speaks cleartext HTTP/2 and is queried through
+``HTTP2Adapter``,
+which multiplexes the requests of every thread over a shared client.
+
+With more threads than the server allows connections,
+the HTTP/1.1 threads queue for a pooled connection,
+as each carries one request at a time,
+while the HTTP/2 requests all share one.
+
+Usage:
+
+.. code-block:: shell
+
+   python -m benchmarks.http2 --jobs 400 --threads 32 --connections 8
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+import h2.config
+import h2.connection
+import h2.events
+import httpx
+import requests
+
+from gtexquery.multithreading.http2 import HTTP2Adapter
+
+BODY = json.dumps(
+    {
+        "medianTranscriptExpression": [
+            {"gencodeId": "ENSG00000000000.1", "median": 1.0, "transcriptId": t}
+            for t in range(20)
+        ]
+    }
+).encode()
+
+
+class _H1Handler(BaseHTTPRequestHandler):
+    """Answer each GET after the server's latency."""
+
+    protocol_version = "HTTP/1.1"
+    # send the body without waiting to have the headers acknowledged
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer a GET."""
+        time.sleep(self.server.latency)  # type: ignore
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args: Any) -> None:
+        """Stay quiet."""
+
+
+class _H1Server(ThreadingHTTPServer):
+    """An HTTP/1.1 server serving a limited number of connections at a time."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, connections: int) -> None:
+        super().__init__(("127.0.0.1", 0), _H1Handler)
+        self.latency = latency
+        self.slots = threading.BoundedSemaphore(connections)
+
+    def process_request_thread(self, request: Any, client_address: Any) -> None:
+        """Hold a connection slot for the life of the connection."""
+        with self.slots:
+            super().process_request_thread(request, client_address)
+
+
+class _H2Protocol(asyncio.Protocol):
+    """A cleartext HTTP/2 server answering each stream after a latency."""
+
+    def __init__(self, latency: float, connections: list[int]) -> None:
+        self.latency = latency
+        self.connections = connections
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False)
+        )
+        self.window = asyncio.Event()
+        self.transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Start the connection, refusing it if the client has too many."""
+        self.transport = transport  # type: ignore
+        self.connections[0] += 1
+        if self.connections[0] > self.connections[1]:
+            transport.close()
+            return
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())  # type: ignore
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        """Free the connection slot."""
+        self.connections[0] -= 1
+
+    def data_received(self, data: bytes) -> None:
+        """Start a response for each new stream."""
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.ensure_future(self._respond(event.stream_id))
+            elif isinstance(event, h2.events.WindowUpdated):
+                self.window.set()
+        self._flush()
+
+    async def _respond(self, stream_id: int) -> None:
+        """Answer a stream after the latency, respecting flow control."""
+        await asyncio.sleep(self.latency)
+        self.conn.send_headers(
+            stream_id,
+            [
+                (":status", "200"),
+                ("content-type", "application/json"),
+                ("content-length", str(len(BODY))),
+            ],
+        )
+        while self.conn.local_flow_control_window(stream_id) < len(BODY):
+            self.window.clear()
+            self._flush()
+            await self.window.wait()
+        self.conn.send_data(stream_id, BODY, end_stream=True)
+        self._flush()
+
+    def _flush(self) -> None:
+        """Send whatever the connection has queued."""
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(self.conn.data_to_send())
+
+
+def _serve_h2(latency: float, connections: int) -> int:
+    """Serve HTTP/2 from a background thread.
+
+    Parameters
+    ----------
+    latency : float
+        Seconds to wait before answering.
+    connections : int
+        The maximum concurrent connections.
+
+    Returns
+    -------
+    int
+        The port served on.
+    """
+    loop = asyncio.new_event_loop()
+    count = [0, connections]
+    server = loop.run_until_complete(
+        loop.create_server(
+            lambda: _H2Protocol(latency, count), "127.0.0.1", 0  # noqa: S104
+        )
+    )
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1]
+
+
+def _run(
+    session: Callable[[], requests.Session], url: str, jobs: int, threads: int
+) -> float:
+    """Time concurrent GETs.
+
+    Parameters
+    ----------
+    session : Callable[[], requests.Session]
+        Returns the calling thread's session.
+    url : str
+        The URL to query.
+    jobs : int
+        The number of requests.
+    threads : int
+        The number of threads.
+
+    Returns
+    -------
+    float
+        The wall time in seconds.
+    """
+
+    def get(_: int) -> None:
+        session().get(url).raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(get, range(jobs)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    h1 = _H1Server(args.latency, args.connections)
+    threading.Thread(target=h1.serve_forever, daemon=True).start()
+    h2_port = _serve_h2(args.latency, args.connections)
+
+    h1_pool = requests.Session()
+    h1_pool.mount(
+        "http://",
+        requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=args.connections, pool_block=True
+        ),
+    )
+
+    def h1_session() -> requests.Session:
+        return h1_pool
+
+    local = threading.local()
+
+    adapter = HTTP2Adapter(httpx.AsyncClient(http1=False, http2=True))
+
+    def h2_session() -> requests.Session:
+        if not hasattr(local, "h2"):
+            local.h2 = requests.Session()
+            local.h2.mount("http://", adapter)
+        return local.h2
+
+    h1_url = f"http://127.0.0.1:{h1.server_address[1]}/"
+    h2_url = f"http://127.0.0.1:{h2_port}/"
+    http1 = _run(h1_session, h1_url, args.jobs, args.threads)
+    http2 = _run(h2_session, h2_url, args.jobs, args.threads)
+    h1.shutdown()
+
+    print(
+        f"{args.jobs} requests, {args.threads} threads, "
+        f"{args.connections} connections allowed, {args.latency * 1000:.0f} ms latency"
+    )
+    print(f"HTTP/1.1 pool:     {http1:.2f} s ({args.jobs / http1:.0f} req/s)")
+    print(f"HTTP/2 backend:    {http2:.2f} s ({args.jobs / http2:.0f} req/s)")
+    print(f"Speed-up: {http1 / http2:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
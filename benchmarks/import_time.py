@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the start-up cost of a single snakemake job.
+
+Each job in the pipeline is a fresh interpreter,
+so for many small jobs the cost of importing the package can dominate.
+This script times a number of fresh interpreters that import a module -
+by default, the *request* step -
+and reports which heavy dependencies were loaded along the way.
+
+Usage:
+
+.. code-block:: shell
+
+   python -m benchmarks.import_time --runs 50 gtexquery.data_handling.request
+"""
+import argparse
+import statistics
+import subprocess  # noqa: S404
+import sys
+import time
+
+HEAVY = ["numpy", "pandas", "requests"]
+
+
+def time_import(module: str, runs: int) -> list[float]:
+    """Time the import of a module in fresh interpreters.
+
+    Parameters
+    ----------
+    module : str
+        The module to import.
+    runs : int
+        The number of interpreters to start.
+
+    Returns
+    -------
+    list[float]
+        The wall time, in seconds, of each run.
+    """
+    command = [sys.executable, "-c", f"import {module}"]
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True)  # noqa: S603
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def loaded_dependencies(module: str) -> list[str]:
+    """List the heavy dependencies loaded by importing a module.
+
+    Parameters
+    ----------
+    module : str
+        The module to import.
+
+    Returns
+    -------
+    list[str]
+        The members of ``HEAVY`` found in ``sys.modules`` after import.
+    """
+    code = (
+        "import sys;"
+        f"import {module};"
+        f"print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    return result.stdout.split()
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="gtexquery.data_handling.request")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    baseline = time_import("sys", args.runs)
+    times = time_import(args.module, args.runs)
+    overhead = statistics.median(times) - statistics.median(baseline)
+    print(f"Imported {args.module} {args.runs} times")
+    print(f"Median wall time: {statistics.median(times) * 1000:.1f} ms")
+    print(f"Median overhead over a bare interpreter: {overhead * 1000:.1f} ms")
+    print(f"Heavy dependencies loaded: {loaded_dependencies(args.module) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,25 @@ XML_QUERY : Callable[[list[str]], str]
     A lambda funcion encapsulating the unwieldy XML query string required by
     Biomart. The list of transcript are joined to form the ensembl_transcript_id
     field.
+COLUMNS : list[str]
+    The columns of the *biomart* step output.
 """
+from __future__ import annotations
+
 import logging
-from io import StringIO
-from typing import Callable
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Optional
 
-import pandas as pd
-import requests
+from ..logs.profiling import profiled
 
-from ..multithreading.request import _get_session
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+COLUMNS: list[str] = ["geneSymbol", "gencodeId", "transcriptId", "refseq"]
+
 XML_QUERY: Callable[[list[str]], str] = lambda transcripts: (
     "<?xml version='1.0' encoding='UTF-8'?>"
     "<!DOCTYPE Query>"
@@ -35,28 +42,48 @@ XML_QUERY: Callable[[list[str]], str] = lambda transcripts: (
 )
 
 
-def biomart_request(infile: str, output: str) -> None:
-    """Query Biomart with a list of transcripts.
+def _read_transcripts(infile: str) -> list[str]:
+    """Read the transcripts from the output of the GTEx query.
 
-    Instantiates a thread_local `request.Session` before querying Biomart
-    with a list of transcript IDs. Should an error occur, it is logged using the
-    `logging.exception` method.
+    Parameters
+    ----------
+    infile : str
+        The output of the GTEx query.
+
+    Returns
+    -------
+    list[str]
+    """
+    from .schema import read_frame
+
+    return read_frame(infile, usecols=["transcriptId"])["transcriptId"].tolist()
+
+
+def _fetch_biomart(infile: str) -> str:
+    """Query Biomart with the transcripts in a file.
+
+    This is the I/O bound half of ``biomart_request``.
 
     Parameters
     ----------
     infile : str
-        The input file.
-        This is expected to be the output of the GTEx query, and will fail if
-        the expected columns are not present.
-    output : str
-        Where to save results
+        The output of the GTEx query.
+
+    Returns
+    -------
+    str
+        The body of the response.
 
     Raises
     ------
     requests.HTTPError
         When the GET request fails
     """
-    transcripts = pd.read_csv(infile)["transcriptId"].tolist()
+    import requests
+
+    from ..multithreading.request import _get_session
+
+    transcripts = _read_transcripts(infile)
 
     s = _get_session()
     response = s.get(
@@ -72,6 +99,152 @@ def biomart_request(infile: str, output: str) -> None:
         raise
     else:
         logger.info(f"GET request for {transcripts} successful!")
-        data = pd.read_csv(StringIO(response.text), sep="\t")
-        data.columns = ["geneSymbol", "gencodeId", "transcriptId", "refseq"]
+        return response.text
+
+
+def _parse_biomart(text: str) -> pd.DataFrame:
+    """Parse a Biomart response.
+
+    Parameters
+    ----------
+    text : str
+        The body of the response.
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    from io import StringIO
+
+    from .schema import read_frame
+
+    return read_frame(
+        StringIO(text),
+        sep="\t",
+        header=0,
+        names=COLUMNS,
+    )
+
+
+def _write_biomart(text: str, output: str) -> str:
+    """Parse a Biomart response and save the results.
+
+    This is the CPU bound half of ``biomart_request``.
+
+    Parameters
+    ----------
+    text : str
+        The body of the response.
+    output : str
+        Where to save results
+
+    Returns
+    -------
+    str
+        The output file.
+    """
+    _parse_biomart(text).to_csv(output, index=False)
+    return output
+
+
+@lru_cache(maxsize=None)
+def load_mapping(path: str) -> tuple[pd.DataFrame, np.ndarray]:
+    """Load a local Ensembl export, once per process.
+
+    The export is expected to be a tab separated BioMart download,
+    with a header row,
+    of the HGNC symbol, gene stable ID, transcript stable ID, and RefSeq mRNA ID -
+    the same attributes, in the same order, as ``XML_QUERY``.
+
+    Parameters
+    ----------
+    path : str
+        The export.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, np.ndarray]
+        The export, with compact dtypes and sorted by transcript,
+        and the sorted transcripts as a plain array for searching.
+    """
+    from .schema import read_frame
+
+    data = read_frame(path, sep="\t", header=0, names=COLUMNS)
+    data = data.sort_values("transcriptId", kind="stable", ignore_index=True)
+    logger.info(f"Loaded {len(data)} transcripts from {path}")
+    return data, data["transcriptId"].astype(str).to_numpy()
+
+
+def _lookup_offline(transcripts: list[str], path: str) -> pd.DataFrame:
+    """Answer a BioMart query from a local Ensembl export.
+
+    Every row for every transcript is found with two vectorised binary
+    searches over the sorted export.
+
+    Parameters
+    ----------
+    transcripts : list[str]
+        The transcripts to look up.
+    path : str
+        The export.
+        See ``load_mapping``.
+
+    Returns
+    -------
+    pd.DataFrame
+        The matching rows, in the order of ``transcripts``.
+        Transcripts missing from the export are dropped,
+        as they are by BioMart.
+    """
+    import numpy as np
+
+    data, keys = load_mapping(path)
+    queries = np.asarray(transcripts, dtype=str)
+    start = keys.searchsorted(queries, side="left")
+    counts = keys.searchsorted(queries, side="right") - start
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return data.take(np.repeat(start, counts) + offsets)
+
+
+@profiled("biomart")
+def biomart_request(
+    infile: str,
+    output: str,
+    mapping: Optional[str] = None,
+    response: Optional[str] = None,
+) -> None:
+    """Query Biomart with a list of transcripts.
+
+    Instantiates a thread_local `request.Session` before querying Biomart
+    with a list of transcript IDs. Should an error occur, it is logged using the
+    `logging.exception` method.
+
+    If a local Ensembl export is given,
+    the transcripts are looked up in it instead,
+    without touching the network.
+
+    Parameters
+    ----------
+    infile : str
+        The input file.
+        This is expected to be the output of the GTEx query, and will fail if
+        the expected columns are not present.
+    output : str
+        Where to save results
+    mapping : Optional[str]
+        A local Ensembl export.
+        See ``load_mapping``.
+    response : Optional[str]
+        The body of a response already fetched for ``infile``,
+        to parse instead of querying BioMart,
+        as done by ``gtexquery.multithreading.hybrid``.
+    """
+    if mapping is not None:
+        data = _lookup_offline(_read_transcripts(infile), mapping)
         data.to_csv(output, index=False)
+        logger.info(f"Offline lookup for {infile} successful!")
+        return
+
+    if response is None:
+        response = _fetch_biomart(infile)
+    _write_biomart(response, output)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Normalisation of Ensembl IDs.
+
+GTEx reports versioned Ensembl IDs (``ENSG00000144355.14``),
+whereas BioMart and MANE are joined on the stable ID alone.
+The routines here strip the version once,
+working on the unique values of a column rather than on every row.
+
+Attributes
+----------
+ID_COLUMNS : list[str]
+    The Ensembl ID columns shared by every step.
+"""
+import numpy as np
+import pandas as pd
+
+ID_COLUMNS: list[str] = ["gencodeId", "transcriptId"]
+
+
+def _split_version(ids: pd.Series) -> tuple[pd.Categorical, pd.Categorical]:
+    """Split a column of IDs into stable ID and version.
+
+    The split happens on the first ``"."``,
+    and is computed once per unique value.
+
+    Parameters
+    ----------
+    ids : pd.Series
+        The IDs to split.
+        Missing values are preserved in both outputs.
+
+    Returns
+    -------
+    tuple[pd.Categorical, pd.Categorical]
+        The stable IDs and the versions.
+        IDs without a version have a missing version.
+    """
+    codes, uniques = pd.factorize(ids)
+    # partition yields no columns at all for an empty input
+    parts = (
+        pd.Series(uniques, dtype=object).str.partition(".").reindex(columns=[0, 1, 2])
+    )
+
+    def remap(values: pd.Series) -> pd.Categorical:
+        new_codes, new_uniques = pd.factorize(values.replace("", np.nan))
+        mapped = np.where(codes >= 0, new_codes[codes], -1)
+        return pd.Categorical.from_codes(mapped, categories=new_uniques)
+
+    return remap(parts[0]), remap(parts[2])
+
+
+def _has_version(ids: pd.Series) -> bool:
+    """Check whether any ID in a column carries a version.
+
+    Only the unique values,
+    or the categories of a categorical column,
+    are searched.
+
+    Parameters
+    ----------
+    ids : pd.Series
+        The IDs to check.
+
+    Returns
+    -------
+    bool
+    """
+    values = ids.cat.categories if ids.dtype == "category" else ids.unique()
+    return bool(pd.Series(values, dtype=object).str.contains(".", regex=False).any())
+
+
+def normalize_ids(
+    data: pd.DataFrame,
+    columns: list[str] = ID_COLUMNS,
+    keep_version: bool = False,
+) -> pd.DataFrame:
+    """Strip the version suffix from Ensembl ID columns.
+
+    The frame is modified in place and returned for chaining.
+    A column whose unique values carry no version is only made categorical,
+    so normalising a table again -
+    the MANE annotations shared across a run,
+    for instance -
+    costs a scan of its unique IDs.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The frame to normalise.
+    columns : list[str]
+        The ID columns to normalise.
+        Columns absent from ``data`` are ignored.
+    keep_version : bool
+        If True,
+        the versions are stored in a new ``<column>Version`` column.
+
+    Returns
+    -------
+    pd.DataFrame
+        ``data``, with categorical, unversioned ID columns.
+
+    Example
+    -------
+    >>> data = pd.DataFrame({"gencodeId": ["ENSG00000139352.3", "ENSG00000139352"]})
+    >>> normalize_ids(data, keep_version=True)["gencodeId"].tolist()
+    ['ENSG00000139352', 'ENSG00000139352']
+    >>> data["gencodeIdVersion"].tolist()
+    ['3', nan]
+    """
+    for column in columns:
+        if column not in data.columns:
+            continue
+        if not keep_version and not _has_version(data[column]):
+            if data[column].dtype != "category":
+                data[column] = data[column].astype("category")
+            continue
+        stable, version = _split_version(data[column])
+        data[column] = stable
+        if keep_version:
+            data[f"{column}Version"] = version
+    return data
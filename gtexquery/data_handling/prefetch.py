@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Tissue wide prefetching for the *request* step.
+
+When a panel covers a large share of the genome,
+one mediantranscriptexpression query per gene is wasteful.
+Instead,
+a tissue's transcripts can be fetched once -
+for the panel's genes in large batches,
+or for every gene from a local export of GTEx -
+and stored as an indexed table.
+``gtex_request`` then answers each gene for that tissue from memory,
+finding no rows for a gene the table does not hold:
+
+.. code-block:: python
+
+   prefetch_tissue("Brain_Hypothalamus", genes, "Brain_Hypothalamus.pkl")
+   gtex_request("Brain_Hypothalamus", gene, output,
+                prefetched="Brain_Hypothalamus.pkl")
+
+Tables are pickled,
+which keeps the compact dtypes and needs no further dependencies.
+
+Attributes
+----------
+COLUMNS : list[str]
+    The columns of a mediantranscriptexpression response.
+"""
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .ids import normalize_ids
+from .request import _fetch_gtex
+from .schema import apply_schema, read_frame
+
+logger = logging.getLogger(__name__)
+
+COLUMNS: list[str] = [
+    "gencodeId",
+    "geneSymbol",
+    "tissueSiteDetailId",
+    "transcriptId",
+    "median",
+    "unit",
+    "datasetId",
+]
+
+
+def _store(data: pd.DataFrame, region: str, output: Union[Path, str]) -> None:
+    """Index a tissue's transcripts by gene and pickle them.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The mediantranscriptexpression rows for the tissue.
+    region : str
+        The GTEx region the rows belong to.
+    output : Union[Path, str]
+        Where to save the table.
+
+    Raises
+    ------
+    ValueError
+        If the rows belong to another region.
+    """
+    # the label is trusted by lookup, so check it against what came back
+    found = set(data["tissueSiteDetailId"].dropna().unique()) - {region}
+    if found:
+        raise ValueError(f"Expected rows for {region}, but received {sorted(found)}")
+    data = normalize_ids(data).set_index("gencodeId").sort_index()
+    data.attrs = {"region": region}
+    data.to_pickle(output)
+    logger.info(f"Stored {len(data)} transcripts for {region}")
+
+
+def prefetch_tissue(
+    region: str,
+    genes: Sequence[str],
+    output: Union[Path, str],
+    batch_size: int = 50,
+) -> None:
+    """Download the transcripts of some genes in a tissue in a few large requests.
+
+    Only ``genes`` are fetched, not the whole tissue,
+    so the table answers for those genes alone.
+    Genes that do not start with "ENSG" are ignored,
+    as they would be skipped by ``gtex_request``.
+    If none remain,
+    an empty table is stored.
+
+    Parameters
+    ----------
+    region : str
+        The GTEx region to query.
+    genes : Sequence[str]
+        The ENSGs to fetch.
+    output : Union[Path, str]
+        Where to save the table.
+    batch_size : int
+        The number of genes per request.
+    """
+    from io import StringIO
+
+    genes = [gene for gene in genes if gene.startswith("ENSG")]
+    if not genes:
+        logger.warning(f"No ENSGs to prefetch for {region}, storing an empty table")
+        _store(apply_schema(pd.DataFrame(columns=COLUMNS)), region, output)
+        return
+    frames = [
+        read_frame(
+            StringIO(_fetch_gtex(region, ",".join(genes[i : i + batch_size]))),
+            sep="\t",
+        )
+        for i in range(0, len(genes), batch_size)
+    ]
+    _store(pd.concat(frames, ignore_index=True), region, output)
+
+
+def prefetch_offline(
+    region: str, infile: Union[Path, str], output: Union[Path, str]
+) -> None:
+    """Build a tissue table from a local export of GTEx.
+
+    Parameters
+    ----------
+    region : str
+        The GTEx region to keep.
+    infile : Union[Path, str]
+        A tab separated file with the columns of a
+        mediantranscriptexpression response.
+        It may hold several tissues.
+    output : Union[Path, str]
+        Where to save the table.
+    """
+    data = read_frame(infile, sep="\t")
+    data = data.loc[data["tissueSiteDetailId"] == region].reset_index(drop=True)
+    _store(data, region, output)
+
+
+def load_tissue(path: str) -> tuple[pd.DataFrame, dict[str, np.ndarray]]:
+    """Load a tissue table, once per process and version of the file.
+
+    A table rewritten since it was loaded is read again.
+
+    Parameters
+    ----------
+    path : str
+        The table written by ``prefetch_tissue`` or ``prefetch_offline``.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, dict[str, np.ndarray]]
+        The table,
+        and the row positions of each gene within it.
+    """
+    return _load_tissue(path, os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _load_tissue(path: str, mtime: int) -> tuple[pd.DataFrame, dict[str, np.ndarray]]:
+    """Load a tissue table and find the rows of each gene.
+
+    Parameters
+    ----------
+    path : str
+        The table.
+    mtime : int
+        The modification time of the table, in nanoseconds,
+        so that each version is cached separately.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, dict[str, np.ndarray]]
+        The table,
+        and the row positions of each gene within it.
+    """
+    data = pd.read_pickle(path)  # noqa: S301
+    codes, genes = pd.factorize(data.index)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[codes >= 0], minlength=len(genes))
+    positions = dict(zip(genes, np.split(order, np.cumsum(counts)[:-1])))
+    return data, positions
+
+
+def lookup(path: str, region: str, gene: str) -> pd.DataFrame:
+    """Answer a mediantranscriptexpression query from a tissue table.
+
+    Parameters
+    ----------
+    path : str
+        The tissue table.
+    region : str
+        The GTEx region being queried.
+    gene : str
+        The ENSG being queried.
+        Its version, if any, is ignored.
+
+    Returns
+    -------
+    pd.DataFrame
+        The rows for ``gene``,
+        in the same layout as a parsed GTEx response.
+        Empty if the gene is not in the table.
+
+    Raises
+    ------
+    ValueError
+        If the table was built for a different region.
+    """
+    data, positions = load_tissue(path)
+    if data.attrs.get("region") != region:
+        raise ValueError(f"{path} does not hold data for {region}")
+    rows = positions.get(gene.split(".")[0], np.array([], dtype=int))
+    return data.iloc[rows].reset_index()
@@ -7,9 +7,14 @@ from typing import Union
 
 import pandas as pd
 
+from ..logs.profiling import profiled
+from .ids import normalize_ids
+from .schema import apply_schema, read_frame, union_categories
+
 logger = logging.getLogger(__name__)
 
 
+@profiled("process")
 def merge_data(
     gtex_path: Union[Path, str],
     bm_path: Union[Path, str],
@@ -26,15 +31,27 @@ def merge_data(
         Path to the file containing BioMart query data.
     mane : pd.DataFrame
         A DataFrame containing MANE annotations.
+        Only the rows for this gene are copied,
+        normalised and cast to the compact schema before merging,
+        so the caller's frame is left unchanged.
     out_path : Union[Path, str]
         Path to the output file.
     """
-    gtex = pd.read_csv(gtex_path, header=0, index_col=None)
+    gtex = read_frame(gtex_path, header=0, index_col=None)
 
     gene = gtex["geneSymbol"].unique()[0]
     logger.info(f"Processing data for gene {gene}")
 
-    bm = pd.read_csv(bm_path, header=0, index_col=None)
+    bm = read_frame(bm_path, header=0, index_col=None)
+    # rows for other genes can never match, so only this gene's are cast
+    genes = gtex["geneSymbol"].cat.categories.union(bm["geneSymbol"].cat.categories)
+    mane = mane.loc[mane["geneSymbol"].isin(genes)].copy()
+    for column in mane.select_dtypes("category"):
+        mane[column] = mane[column].cat.remove_unused_categories()
+    gtex, bm, mane = union_categories(
+        [gtex, bm, apply_schema(normalize_ids(mane))],
+        ["geneSymbol", "gencodeId", "transcriptId", "refseq"],
+    )
     data = (
         gtex.merge(bm, on=["geneSymbol", "gencodeId", "transcriptId"], how="outer")
         .merge(
@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
-"""Data handling for *request* step."""
+"""Data handling for *request* step.
+
+Under snakemake,
+every job is a fresh Python process,
+and many of them do no more than skip a gene missing from Gencode.
+pandas and requests are therefore only imported once a function needs them,
+keeping ``import gtexquery.data_handling.request`` - and the skip path -
+cheap.
+"""
+from __future__ import annotations
+
 import logging
-from io import StringIO
+from typing import TYPE_CHECKING, Optional
 
-import pandas as pd
-import requests
+from ..logs.profiling import profiled
 
-from ..multithreading.request import _get_session
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +48,7 @@ def lut_check(gene: str, lut: pd.DataFrame) -> str:
 
     Example
     -------
+    >>> import pandas as pd
     >>> lut = pd.DataFrame.from_dict({"name": ["ASCL1"], "id": ["ENSG00000139352.3"]})
     >>> lut_check("ASCL1", lut)
     'ENSG00000139352.3'
@@ -52,15 +63,37 @@ def lut_check(gene: str, lut: pd.DataFrame) -> str:
     return ensg
 
 
-def gtex_request(region: str, gene: str, output: str) -> None:
-    """Make a thead-safe gtex request against mediantranscriptexpression.
+def _expressed_transcripts(data: pd.DataFrame) -> pd.DataFrame:
+    """Filter, sort, and normalise a GTEx response.
 
-    If gene starts with "ENSG", a query is made to GTEx. If it does not, no file is
-    created. This is designed to be used with snakemake checkpoints.
+    Transcripts with a median of 0 are dropped,
+    and the rest are sorted by descending median.
+    Both are resolved into a single positional index,
+    so only one copy of the frame is taken before the IDs are normalised.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The parsed mediantranscriptexpression response.
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    import numpy as np
+
+    from .ids import normalize_ids
+
+    median = data["median"].to_numpy()
+    expressed = np.flatnonzero(median > 0)
+    order = expressed[np.argsort(-median[expressed], kind="stable")]
+    return normalize_ids(data.take(order))
 
-    A thread local session is provided by a call to ``_get_session``.
-    This allows the reuse of sessions, which, among other things,
-    provides significant speed ups.
+
+def _fetch_gtex(region: str, gene: str) -> str:
+    """Query mediantranscriptexpression for a single gene.
+
+    This is the I/O bound half of ``gtex_request``.
 
     Parameters
     ----------
@@ -68,29 +101,31 @@ def gtex_request(region: str, gene: str, output: str) -> None:
         The gtex region to query.
     gene : str
         The ensg to query.
-    output : str
-        Where to save the output file.
+
+    Returns
+    -------
+    str
+        The body of the response.
 
     Raises
     ------
     requests.HTTPError
         When the get request returns an error
     """
-    # if gene is none, write blank file
-    if not gene.startswith("ENSG"):
-        logger.warning(
-            f"{gene} was not found in Gencode. It will be skipped in further analysis."
-        )
-        exit()
+    import requests
 
-    s = _get_session(
-        headers={"Accept": "text/html"},
-        params={"datasetId": "gtex_v8", "tissueSiteDetailId": region, "format": "tsv"},
-    )
+    from ..multithreading.request import _get_session
+
+    # the session outlives this request, so nothing request specific is kept on it
+    s = _get_session()
 
     response = s.get(
         "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression",
+        headers={"Accept": "text/html"},
         params={
+            "datasetId": "gtex_v8",
+            "tissueSiteDetailId": region,
+            "format": "tsv",
             "gencodeId": gene,
         },
     )
@@ -104,9 +139,102 @@ def gtex_request(region: str, gene: str, output: str) -> None:
         raise
     else:
         logger.info(f"Get request for {gene} successful!")
-        data = pd.read_csv(StringIO(response.text), sep="\t")
-        data = data.loc[data["median"] > 0, :].sort_values("median", ascending=False)
-        data.loc[:, ["gencodeId", "transcriptId"]] = data.loc[
-            :, ["gencodeId", "transcriptId"]
-        ].apply(lambda x: x.str.split(".").str.get(0))
+        return response.text
+
+
+def _parse_gtex(text: str) -> pd.DataFrame:
+    """Parse a mediantranscriptexpression response.
+
+    Parameters
+    ----------
+    text : str
+        The body of the response.
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    from io import StringIO
+
+    from .schema import read_frame
+
+    return read_frame(StringIO(text), sep="\t")
+
+
+def _write_gtex(text: str, output: str) -> str:
+    """Parse a mediantranscriptexpression response and save the results.
+
+    This is the CPU bound half of ``gtex_request``.
+
+    Parameters
+    ----------
+    text : str
+        The body of the response.
+    output : str
+        Where to save the output file.
+
+    Returns
+    -------
+    str
+        The output file.
+    """
+    data = _expressed_transcripts(_parse_gtex(text))
+    data.to_csv(output, index=False)
+    return output
+
+
+@profiled("request")
+def gtex_request(
+    region: str,
+    gene: str,
+    output: str,
+    prefetched: Optional[str] = None,
+    response: Optional[str] = None,
+) -> None:
+    """Make a thead-safe gtex request against mediantranscriptexpression.
+
+    If gene starts with "ENSG", a query is made to GTEx. If it does not, no file is
+    created. This is designed to be used with snakemake checkpoints.
+
+    A thread local session is provided by a call to ``_get_session``.
+    This allows the reuse of sessions, which, among other things,
+    provides significant speed ups.
+
+    If a table from ``gtexquery.data_handling.prefetch`` is given,
+    the gene is answered from it instead,
+    without touching the network.
+
+    Parameters
+    ----------
+    region : str
+        The gtex region to query.
+    gene : str
+        The ensg to query.
+    output : str
+        Where to save the output file.
+    prefetched : Optional[str]
+        A tissue table for ``region``,
+        written by ``prefetch_tissue`` or ``prefetch_offline``.
+    response : Optional[str]
+        The body of a response already fetched for this gene,
+        to parse instead of querying GTEx,
+        as done by ``gtexquery.multithreading.hybrid``.
+    """
+    # if gene is none, write blank file
+    if not gene.startswith("ENSG"):
+        logger.warning(
+            f"{gene} was not found in Gencode. It will be skipped in further analysis."
+        )
+        exit()
+
+    if prefetched is not None:
+        from .prefetch import lookup
+
+        data = _expressed_transcripts(lookup(prefetched, region, gene))
         data.to_csv(output, index=False)
+        logger.info(f"Prefetched data for {gene} used!")
+        return
+
+    if response is None:
+        response = _fetch_gtex(region, gene)
+    _write_gtex(response, output)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Shared column schema for the data handling steps.
+
+pandas defaults to ``object`` for every string column and ``float64`` for
+every float.
+For the frames handled here,
+that is wasteful:
+the ID columns are highly repetitive,
+and GTEx reports its medians at single precision anyway.
+The dtypes below are applied when a frame is read,
+so every step works on compact frames.
+
+Attributes
+----------
+DTYPES : dict[str, str]
+    Mapping of known column names to their compact dtype.
+    ID and label columns are stored as ``category``,
+    expression values as ``float32``.
+"""
+from typing import Any
+
+import pandas as pd
+
+DTYPES: dict[str, str] = {
+    "geneSymbol": "category",
+    "gencodeId": "category",
+    "transcriptId": "category",
+    "refseq": "category",
+    "MANE_status": "category",
+    "tissueSiteDetailId": "category",
+    "unit": "category",
+    "datasetId": "category",
+    "median": "float32",
+}
+
+
+def read_frame(filepath_or_buffer: Any, **kwargs: Any) -> pd.DataFrame:
+    r"""Read a delimited file, applying the compact schema.
+
+    Columns not listed in ``DTYPES`` keep the pandas defaults.
+    Any ``dtype`` passed explicitly takes precedence over the schema.
+
+    Parameters
+    ----------
+    filepath_or_buffer : Any
+        Anything accepted by ``pd.read_csv``.
+    **kwargs : Any
+        Further keyword arguments for ``pd.read_csv``.
+
+    Returns
+    -------
+    pd.DataFrame
+
+    Example
+    -------
+    >>> from io import StringIO
+    >>> data = read_frame(StringIO("geneSymbol,median\nDLX1,5.18"))
+    >>> data.dtypes.astype(str).tolist()
+    ['category', 'float32']
+    """
+    dtype = dict(DTYPES)
+    dtype.update(kwargs.pop("dtype", None) or {})
+    return pd.read_csv(filepath_or_buffer, dtype=dtype, **kwargs)
+
+
+def apply_schema(data: pd.DataFrame) -> pd.DataFrame:
+    """Cast the known columns of an existing frame to the compact schema.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The frame to cast.
+
+    Returns
+    -------
+    pd.DataFrame
+        A new frame with compact dtypes.
+
+    Example
+    -------
+    >>> data = pd.DataFrame({"geneSymbol": ["DLX1"], "other": ["x"]})
+    >>> apply_schema(data).dtypes.astype(str).tolist()
+    ['category', 'object']
+    """
+    # assigning column by column avoids the concat behind ``astype(dict)``
+    data = data.copy(deep=False)
+    for column in data.columns:
+        if column in DTYPES and data[column].dtype != DTYPES[column]:
+            data[column] = data[column].astype(DTYPES[column])
+    return data
+
+
+def union_categories(
+    frames: list[pd.DataFrame], columns: list[str]
+) -> list[pd.DataFrame]:
+    """Give categorical columns a shared set of categories across frames.
+
+    pandas can only merge categorical keys on their integer codes
+    when both sides have identical categories.
+    Otherwise,
+    it silently falls back to comparing ``object`` values.
+
+    Parameters
+    ----------
+    frames : list[pd.DataFrame]
+        The frames to align.
+        A frame without one of ``columns`` is left out of its union.
+    columns : list[str]
+        The columns whose categories should be unified.
+
+    Returns
+    -------
+    list[pd.DataFrame]
+        New frames, in the same order, with aligned categorical columns.
+
+    Example
+    -------
+    >>> a = apply_schema(pd.DataFrame({"geneSymbol": ["DLX1"]}))
+    >>> b = apply_schema(pd.DataFrame({"geneSymbol": ["ASCL1"]}))
+    >>> a, b = union_categories([a, b], ["geneSymbol"])
+    >>> a["geneSymbol"].dtype == b["geneSymbol"].dtype
+    True
+    """
+    dtypes: dict[str, pd.CategoricalDtype] = {}
+    for column in columns:
+        categories = pd.Index([], dtype=object)
+        for frame in frames:
+            if column in frame.columns:
+                categories = categories.union(
+                    frame[column].astype("category").cat.categories
+                )
+        dtypes[column] = pd.CategoricalDtype(categories)
+    aligned = []
+    for frame in frames:
+        frame = frame.copy(deep=False)
+        for column, dtype in dtypes.items():
+            if column in frame.columns and frame[column].dtype != dtype:
+                frame[column] = frame[column].astype(dtype)
+        aligned.append(frame)
+    return aligned
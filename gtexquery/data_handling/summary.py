@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""Data handling for the cross-tissue *summary* step.
+
+Once ``merge_data`` has run for every gene and tissue,
+the per-file results are summarised into two tables:
+
+- a transcript by tissue matrix of median expression,
+  indexed by gene and transcript,
+- one row per gene,
+  naming the transcript ranked first by its median across tissues
+  and its MANE transcript, if any.
+
+The files are read in batches of ``batch_size``,
+each parsed in one go,
+keeping only the columns needed, in the compact schema.
+Each batch is pivoted in one vectorised pass and then discarded,
+so memory is bounded by the size of a batch plus the summaries themselves,
+however many genes were queried.
+The pivoted batches are combined,
+and the transcripts for every gene picked with a single ``groupby``.
+
+Attributes
+----------
+COLUMNS : list[str]
+    The columns of the ``merge_data`` output read by the summary.
+"""
+import logging
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+import pandas as pd
+
+from ..logs.profiling import profiled
+from .schema import apply_schema, read_frame
+
+logger = logging.getLogger(__name__)
+
+COLUMNS: list[str] = [
+    "geneSymbol",
+    "transcriptId",
+    "tissueSiteDetailId",
+    "median",
+    "MANE_status",
+]
+
+
+def _read_batch(paths: list[Union[Path, str]]) -> pd.DataFrame:
+    """Read a batch of ``merge_data`` outputs with a single parse.
+
+    The per-file overhead of ``read_csv`` dwarfs the parsing of a few rows,
+    so the bodies of files sharing a header are joined and parsed together.
+
+    Parameters
+    ----------
+    paths : list[Union[Path, str]]
+        The files to read.
+
+    Returns
+    -------
+    pd.DataFrame
+        The needed columns of the files, in the compact schema.
+    """
+    bodies: dict[bytes, list[bytes]] = {}
+    for path in paths:
+        with open(path, "rb") as file:
+            header = file.readline()
+            body = file.read()
+        if body and not body.endswith(b"\n"):
+            body += b"\n"
+        bodies.setdefault(header.rstrip(b"\r\n") + b"\n", []).append(body)
+    frames = [
+        read_frame(BytesIO(header + b"".join(body)), usecols=COLUMNS)
+        for header, body in bodies.items()
+    ]
+    if len(frames) == 1:
+        return frames[0]
+    # categories differ between frames, so re-derive them
+    return apply_schema(pd.concat(frames, ignore_index=True))
+
+
+def _batches(
+    paths: Iterable[Union[Path, str]], batch_size: int
+) -> Iterator[pd.DataFrame]:
+    """Read ``merge_data`` outputs a batch at a time.
+
+    Parameters
+    ----------
+    paths : Iterable[Union[Path, str]]
+        The files to read.
+    batch_size : int
+        The number of files in each batch.
+
+    Yields
+    ------
+    pd.DataFrame
+        The needed columns of a batch of files, in the compact schema.
+    """
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield _read_batch(batch)
+            batch = []
+    if batch:
+        yield _read_batch(batch)
+
+
+def _pivot(data: pd.DataFrame) -> pd.DataFrame:
+    """Pivot a batch into a transcript by tissue matrix of medians.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        A batch of ``merge_data`` outputs.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by ``geneSymbol`` and ``transcriptId``,
+        with a column per tissue.
+    """
+    matrix = data.dropna(subset=["median", "tissueSiteDetailId"]).pivot_table(
+        index=["geneSymbol", "transcriptId"],
+        columns="tissueSiteDetailId",
+        values="median",
+        aggfunc="first",
+        observed=True,
+    )
+    # categories differ between batches, plain labels concatenate cleanly
+    matrix.columns = matrix.columns.astype(str)
+    matrix.index = matrix.index.set_levels(
+        [level.astype(str) for level in matrix.index.levels]
+    )
+    return matrix
+
+
+def _mane_flags(data: pd.DataFrame) -> pd.DataFrame:
+    """Find the MANE transcripts in a batch.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        A batch of ``merge_data`` outputs.
+
+    Returns
+    -------
+    pd.DataFrame
+        The unique ``geneSymbol``, ``transcriptId`` and ``MANE_status``
+        of MANE transcripts.
+    """
+    flagged = data.loc[
+        data["MANE_status"].notna(), ["geneSymbol", "transcriptId", "MANE_status"]
+    ]
+    return flagged.astype(str).drop_duplicates(["geneSymbol", "transcriptId"])
+
+
+def _pick_transcripts(matrix: pd.DataFrame, flags: pd.DataFrame) -> pd.DataFrame:
+    """Pick the top and the MANE transcript of each gene.
+
+    Transcripts are ranked by the median of their per tissue medians,
+    so the top transcript is typical across tissues
+    rather than the one peaking in a single tissue.
+
+    Parameters
+    ----------
+    matrix : pd.DataFrame
+        The transcript by tissue matrix of medians.
+    flags : pd.DataFrame
+        The MANE transcripts.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by ``geneSymbol``,
+        with columns ``top_transcript``, ``top_median``,
+        ``mane_transcript`` and ``MANE_status``.
+        ``top_median`` is the median across tissues of the top transcript.
+    """
+    overall = matrix.median(axis=1).dropna().sort_values(ascending=False, kind="stable")
+    top = (
+        overall[~overall.index.get_level_values("geneSymbol").duplicated()]
+        .rename("top_median")
+        .reset_index("transcriptId")
+        .rename(columns={"transcriptId": "top_transcript"})
+    )
+    # MANE Select sorts before MANE Plus Clinical
+    mane = (
+        flags.sort_values("MANE_status", ascending=False, kind="stable")
+        .drop_duplicates("geneSymbol")
+        .set_index("geneSymbol")
+        .rename(columns={"transcriptId": "mane_transcript"})
+    )
+    genes = top.join(mane, how="outer")
+    genes.index.name = "geneSymbol"
+    return genes
+
+
+@profiled("summary")
+def summarise(
+    paths: Iterable[Union[Path, str]], batch_size: int = 500
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Summarise ``merge_data`` outputs across tissues.
+
+    Parameters
+    ----------
+    paths : Iterable[Union[Path, str]]
+        The ``merge_data`` output files, one per gene and tissue.
+    batch_size : int
+        The number of files read at once.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        The transcript by tissue matrix of medians,
+        indexed by ``geneSymbol`` and ``transcriptId``,
+        and the per gene table,
+        indexed by ``geneSymbol``,
+        with columns ``top_transcript``, ``top_median``,
+        ``mane_transcript`` and ``MANE_status``.
+    """
+    matrices = []
+    flags = []
+    for n, data in enumerate(_batches(paths, batch_size), 1):
+        matrices.append(_pivot(data))
+        flags.append(_mane_flags(data))
+        logger.info(f"Summarised batch {n}")
+    if not matrices:
+        # nothing to read, the summaries are empty but keep their layout
+        index = pd.MultiIndex.from_arrays(
+            [[], []], names=["geneSymbol", "transcriptId"]
+        )
+        matrices.append(pd.DataFrame(index=index))
+        flags.append(
+            pd.DataFrame(columns=["geneSymbol", "transcriptId", "MANE_status"])
+        )
+
+    # a transcript's tissues may have been read in different batches
+    matrix = (
+        pd.concat(matrices)
+        .groupby(level=["geneSymbol", "transcriptId"])
+        .first()
+        .sort_index(axis=1)
+    )
+    mane = pd.concat(flags).drop_duplicates(["geneSymbol", "transcriptId"])
+    return matrix, _pick_transcripts(matrix, mane)
+
+
+def write_summary(
+    paths: Iterable[Union[Path, str]],
+    matrix_path: Union[Path, str],
+    genes_path: Union[Path, str],
+    batch_size: int = 500,
+) -> None:
+    """Summarise ``merge_data`` outputs and write the results.
+
+    Parameters
+    ----------
+    paths : Iterable[Union[Path, str]]
+        The ``merge_data`` output files, one per gene and tissue.
+    matrix_path : Union[Path, str]
+        Where to write the transcript by tissue matrix.
+    genes_path : Union[Path, str]
+        Where to write the per gene table.
+    batch_size : int
+        The number of files read at once.
+    """
+    matrix, genes = summarise(paths, batch_size)
+    matrix.to_csv(matrix_path)
+    genes.to_csv(genes_path)
+    logger.info(f"Summarised {len(genes)} genes across {matrix.shape[1]} tissues")
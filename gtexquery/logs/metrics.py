@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Run metrics.
+
+A thread safe set of named counters,
+shared by every module in the process.
+Modules record what they observe with ``increment``,
+and reporters read a consistent copy with ``snapshot``:
+
+.. code-block:: python
+
+   from gtexquery.logs import metrics
+
+   metrics.increment("bytes_saved", 1024)
+   metrics.snapshot()["bytes_saved"]
+"""
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Add to a counter.
+
+    Parameters
+    ----------
+    name : str
+        The counter.
+    value : int
+        The amount to add.
+    """
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot() -> dict[str, int]:
+    """Copy the current counters.
+
+    Returns
+    -------
+    dict[str, int]
+
+    Example
+    -------
+    >>> reset()
+    >>> increment("requests")
+    >>> snapshot()
+    {'requests': 1}
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def reset() -> None:
+    """Clear every counter."""
+    with _lock:
+        _counters.clear()
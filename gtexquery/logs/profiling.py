@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Opt-in profiling of the pipeline steps.
+
+``gtex_request``, ``biomart_request`` and ``merge_data`` are wrapped with
+``profiled``.
+When the ``GTEXQUERY_PROFILE`` environment variable is unset,
+the wrapper does no more than check it.
+When it is set,
+each call is profiled and the results written to ``GTEXQUERY_PROFILE_DIR``,
+defaulting to ``gtexquery_profiles``.
+
+``GTEXQUERY_PROFILE`` is a comma separated list of profilers:
+
+- ``cprofile`` runs the step under ``cProfile``,
+  writing a ``.prof`` file for ``pstats`` or ``snakeviz``.
+- ``tracemalloc`` traces allocations during the step.
+
+For every profiled call,
+a short summary of the hottest functions and largest allocations
+is appended to ``summary.txt`` in the same directory.
+
+Both profilers are process wide in effect:
+from Python 3.12 only one ``cProfile`` profiler can be active at a time,
+and ``tracemalloc`` has a single trace.
+Profiled calls are therefore serialised,
+so steps run concurrently -
+by ``run_batch``, the daemon or the hybrid executors -
+run one at a time while profiling is on:
+
+.. code-block:: shell
+
+   GTEXQUERY_PROFILE=cprofile,tracemalloc snakemake ...
+
+Attributes
+----------
+PROFILERS : tuple[str, ...]
+    The supported profilers.
+"""
+import logging
+import os
+import threading
+from functools import wraps
+from itertools import count
+from pathlib import Path
+from typing import Any, Callable, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+PROFILERS: tuple[str, ...] = ("cprofile", "tracemalloc")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_calls = count()
+# held for the whole of a profiled call, see the module docstring
+_profile_lock = threading.Lock()
+_active = threading.local()
+
+
+def _profile(step: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a step under the profilers named in the environment.
+
+    Parameters
+    ----------
+    step : str
+        The name of the step, used to name the output files.
+    func : Callable[..., Any]
+        The step.
+    *args : Any
+        Positional arguments for the step.
+    **kwargs : Any
+        Keyword arguments for the step.
+
+    Returns
+    -------
+    Any
+        The return value of the step.
+
+    Raises
+    ------
+    ValueError
+        If an unknown profiler is requested.
+    """
+    requested = {p.strip() for p in os.environ["GTEXQUERY_PROFILE"].split(",")}
+    unknown = requested - set(PROFILERS) - {""}
+    if unknown:
+        raise ValueError(f"Unknown profilers {unknown}, expected some of {PROFILERS}")
+
+    if getattr(_active, "step", None) is not None:
+        # already covered by the enclosing profile
+        return func(*args, **kwargs)
+
+    outdir = Path(os.environ.get("GTEXQUERY_PROFILE_DIR", "gtexquery_profiles"))
+    outdir.mkdir(parents=True, exist_ok=True)
+    name = f"{step}-{os.getpid()}-{next(_calls)}"
+    with _profile_lock:
+        _active.step = step
+        try:
+            result = _run_profiled(name, requested, outdir, func, *args, **kwargs)
+        finally:
+            _active.step = None
+    logger.info(f"Profiled {step} to {outdir}")
+    return result
+
+
+def _run_profiled(
+    name: str,
+    requested: set[str],
+    outdir: Path,
+    func: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """Run a step under the requested profilers and write the results.
+
+    Parameters
+    ----------
+    name : str
+        The name of this run, used to name the output files.
+    requested : set[str]
+        The profilers to use.
+    outdir : Path
+        Where to write the results.
+    func : Callable[..., Any]
+        The step.
+    *args : Any
+        Positional arguments for the step.
+    **kwargs : Any
+        Keyword arguments for the step.
+
+    Returns
+    -------
+    Any
+        The return value of the step.
+    """
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    # only trace if nobody outside this module already is
+    trace = "tracemalloc" in requested and not tracemalloc.is_tracing()
+    profiler = cProfile.Profile() if "cprofile" in requested else None
+    if trace:
+        tracemalloc.start()
+    try:
+        if profiler is not None:
+            result = profiler.runcall(func, *args, **kwargs)
+        else:
+            result = func(*args, **kwargs)
+    finally:
+        snapshot = tracemalloc.take_snapshot() if trace else None
+        if trace:
+            tracemalloc.stop()
+
+    summary = [f"== {name}"]
+    if profiler is not None:
+        profiler.dump_stats(outdir / f"{name}.prof")
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(10)
+        summary.append(stream.getvalue().strip())
+    if snapshot is not None:
+        summary.extend(str(stat) for stat in snapshot.statistics("lineno")[:10])
+    with open(outdir / "summary.txt", "a") as file:
+        file.write("\n".join(summary) + "\n\n")
+    return result
+
+
+def profiled(step: str) -> Callable[[F], F]:
+    """Profile a step when ``GTEXQUERY_PROFILE`` is set.
+
+    Parameters
+    ----------
+    step : str
+        The name of the step, used to name the output files.
+
+    Returns
+    -------
+    Callable[[F], F]
+        A decorator.
+
+    Example
+    -------
+    >>> @profiled("double")
+    ... def double(x: int) -> int:
+    ...     return 2 * x
+    >>> double(2)
+    4
+    """
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if "GTEXQUERY_PROFILE" not in os.environ:
+                return func(*args, **kwargs)
+            return _profile(step, func, *args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
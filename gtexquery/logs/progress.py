@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Progress reporting for batch runs.
+
+A ``ProgressReporter`` is told each time a unit of work finishes.
+At a fixed interval,
+it logs the completed and total units,
+the rolling request rate for each host,
+the share of responses served from the cache,
+the bytes received over the network and saved by the cache,
+and an estimate of the time remaining.
+A final report is made when the run ends.
+The same figures can be written to a JSON status file for monitoring to poll.
+
+The request rates, cache and byte figures come from
+``gtexquery.logs.metrics``,
+where the sessions created by ``_get_session`` count each response
+under ``requests:<host>``,
+and ``gtexquery.multithreading.cache`` counts the bytes.
+
+The batch executors in ``gtexquery.multithreading`` accept a reporter
+through their ``progress`` parameter:
+
+.. code-block:: python
+
+   with ProgressReporter(len(jobs), status_file="status.json") as progress:
+       run_batch(gtex_request, jobs, progress=progress)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from types import TracebackType
+from typing import Any, Optional, Type
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _megabytes(n: int) -> str:
+    """Format a byte count for the logs.
+
+    Parameters
+    ----------
+    n : int
+        The number of bytes.
+
+    Returns
+    -------
+    str
+
+    Example
+    -------
+    >>> _megabytes(2_500_000)
+    '2.5 MB'
+    """
+    return f"{n / 1e6:.1f} MB"
+
+
+class ProgressReporter:
+    """Report the progress of a batch run.
+
+    Parameters
+    ----------
+    total : int
+        The number of units in the run.
+    interval : float
+        The minimum seconds between reports.
+    status_file : Optional[str]
+        If given,
+        each report is also written here as JSON.
+    window : float
+        The seconds over which rates are averaged.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        interval: float = 30,
+        status_file: Optional[str] = None,
+        window: float = 60,
+    ) -> None:
+        self.total = total
+        self.interval = interval
+        self.status_file = status_file
+        self.window = window
+        self.completed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._last = self.started
+        self._samples: deque[tuple[float, int, dict[str, int]]] = deque()
+        self._sample()
+
+    def _sample(self) -> None:
+        """Record the current counts for the rolling rates."""
+        now = time.monotonic()
+        self._samples.append((now, self.completed, metrics.snapshot()))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+
+    def update(self, n: int = 1) -> None:
+        """Record finished units, reporting if the interval has passed.
+
+        Parameters
+        ----------
+        n : int
+            The number of units finished.
+        """
+        with self._lock:
+            self.completed += n
+            if time.monotonic() - self._last < self.interval:
+                return
+            status = self._status()
+        self.emit(status)
+
+    def _status(self) -> dict[str, Any]:
+        """Compute the current figures.
+
+        Returns
+        -------
+        dict[str, Any]
+        """
+        self._sample()
+        self._last = time.monotonic()
+        then, done_then, counts_then = self._samples[0]
+        now, done_now, counts_now = self._samples[-1]
+        elapsed = max(now - then, 1e-9)
+
+        rates = {
+            name.split(":", 1)[1]: (count - counts_then.get(name, 0)) / elapsed
+            for name, count in counts_now.items()
+            if name.startswith("requests:")
+        }
+        requests = sum(v for k, v in counts_now.items() if k.startswith("requests:"))
+        cached = counts_now.get("cache_hits", 0) + counts_now.get(
+            "cache_revalidated", 0
+        )
+        rate = (done_now - done_then) / elapsed
+        remaining = self.total - self.completed
+        return {
+            "completed": self.completed,
+            "total": self.total,
+            "elapsed": now - self.started,
+            "units_per_second": rate,
+            "requests_per_second": rates,
+            "cache_hit_rate": cached / requests if requests else None,
+            "bytes_transferred": counts_now.get("bytes_transferred", 0),
+            "bytes_saved": counts_now.get("bytes_saved", 0),
+            "eta": remaining / rate if rate > 0 else None,
+        }
+
+    def emit(self, status: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+        """Log a report, and write the status file.
+
+        Parameters
+        ----------
+        status : Optional[dict[str, Any]]
+            The figures to report.
+            Computed afresh if not given.
+
+        Returns
+        -------
+        dict[str, Any]
+            The figures reported.
+        """
+        if status is None:
+            with self._lock:
+                status = self._status()
+        hosts = ", ".join(
+            f"{host} {rate:.1f}/s"
+            for host, rate in status["requests_per_second"].items()
+        )
+        hit_rate = status["cache_hit_rate"]
+        eta = status["eta"]
+        logger.info(
+            f"Completed {status['completed']}/{status['total']}"
+            f" | {hosts or 'no requests'}"
+            f" | cache hits {'n/a' if hit_rate is None else f'{hit_rate:.0%}'}"
+            f" | {_megabytes(status['bytes_transferred'])} transferred"
+            f", {_megabytes(status['bytes_saved'])} saved"
+            f" | ETA {'unknown' if eta is None else f'{eta:.0f}s'}"
+        )
+        if self.status_file is not None:
+            tmp = f"{self.status_file}.tmp"
+            with open(tmp, "w") as file:
+                json.dump(status, file, indent=2)
+            os.replace(tmp, self.status_file)
+        return status
+
+    def __enter__(self) -> ProgressReporter:
+        """Call on entry into ``with`` statement.
+
+        Returns
+        -------
+        ProgressReporter
+            Instance of self
+        """
+        return self
+
+    def __exit__(
+        self,
+        ex_type: Optional[Type[BaseException]],
+        ex_val: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        """Emit a final report on exit from ``with`` statement.
+
+        Parameters
+        ----------
+        ex_type : Optional[Type[BaseException]]
+            Exception type
+        ex_val : Optional[BaseException]
+            Exception value
+        tb : Optional[TracebackType]
+            Traceback
+        """
+        self.emit()
+
+
+def count_response(response: Any, *args: Any, **kwargs: Any) -> None:
+    """Count a response against its host, as a ``requests`` response hook.
+
+    Parameters
+    ----------
+    response : Any
+        The ``requests.Response``.
+    *args : Any
+        Ignored.
+    **kwargs : Any
+        Ignored.
+    """
+    from urllib.parse import urlsplit
+
+    metrics.increment(f"requests:{urlsplit(response.url).hostname}")
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""Failure tolerant batch execution.
+
+Mapping ``gtex_request`` or ``biomart_request`` over a
+``ThreadPoolExecutor`` aborts on the first ``HTTPError``,
+discarding every result still in flight.
+For a run of many thousands of genes,
+that means starting again from scratch.
+
+``run_batch`` instead records each failure and carries on.
+Failures that are likely to be transient -
+rate limiting,
+server errors,
+dropped connections -
+are requeued once the first pass is complete,
+with an exponential backoff between rounds.
+Whatever still fails is written to a JSON report,
+so the run finishes with partial results and a list of what to retry.
+
+Attributes
+----------
+RETRY_STATUS : frozenset[int]
+    HTTP status codes considered transient.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional, Sequence
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ..logs.progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS: frozenset[int] = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class Failure(NamedTuple):
+    """A unit of work that failed.
+
+    Attributes
+    ----------
+    args : tuple
+        The arguments the unit was called with.
+    error : str
+        The name of the exception raised.
+    message : str
+        The message of the exception raised.
+    status : Optional[int]
+        The HTTP status code, if the failure was an HTTP error.
+    retryable : bool
+        Whether the failure is considered transient.
+    attempts : int
+        The number of times the unit was attempted.
+    """
+
+    args: tuple
+    error: str
+    message: str
+    status: Optional[int]
+    retryable: bool
+    attempts: int
+
+
+class BatchResult(NamedTuple):
+    """The outcome of a batch.
+
+    Attributes
+    ----------
+    completed : list[tuple]
+        The arguments of each unit that succeeded.
+    skipped : list[tuple]
+        The arguments of each unit that exited without output,
+        such as genes missing from Gencode.
+    failed : list[Failure]
+        The units that still failed after all retries.
+    """
+
+    completed: list[tuple]
+    skipped: list[tuple]
+    failed: list[Failure]
+
+
+def _is_retryable(error: BaseException) -> tuple[bool, Optional[int]]:
+    """Classify an exception as transient or permanent.
+
+    Parameters
+    ----------
+    error : BaseException
+        The exception raised by a unit of work.
+
+    Returns
+    -------
+    tuple[bool, Optional[int]]
+        Whether the error is transient,
+        and its HTTP status code, if any.
+    """
+    import requests
+
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(error, requests.HTTPError):
+        return status in RETRY_STATUS, status
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True, status
+    return False, status
+
+
+def _attempt(func: Callable[..., Any], args: tuple) -> Optional[BaseException]:
+    """Run a unit of work, capturing any error.
+
+    Parameters
+    ----------
+    func : Callable[..., Any]
+        The function to call.
+    args : tuple
+        The arguments to call it with.
+
+    Returns
+    -------
+    Optional[BaseException]
+        The exception raised, if any.
+        ``SystemExit`` is returned as is,
+        so that skipped units can be told apart.
+    """
+    try:
+        func(*args)
+    except (Exception, SystemExit) as e:
+        return e
+    return None
+
+
+def run_batch(
+    func: Callable[..., Any],
+    jobs: Sequence[tuple],
+    threads: int = 8,
+    retries: int = 3,
+    backoff: float = 1.0,
+    report: Optional[str] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> BatchResult:
+    """Map a function over many jobs, tolerating failures.
+
+    Parameters
+    ----------
+    func : Callable[..., Any]
+        The function to call,
+        such as ``gtex_request`` or ``biomart_request``.
+    jobs : Sequence[tuple]
+        The arguments for each call.
+    threads : int
+        The number of threads.
+    retries : int
+        How many extra rounds to give retryable failures.
+    backoff : float
+        Seconds to wait before the first retry round.
+        The wait doubles with each round.
+    report : Optional[str]
+        If given,
+        a JSON report of the remaining failures is written here.
+    progress : Optional[ProgressReporter]
+        If given,
+        it is updated as each job completes, is skipped, or finally fails.
+
+    Returns
+    -------
+    BatchResult
+    """
+    completed: list[tuple] = []
+    skipped: list[tuple] = []
+    failed: dict[tuple, Failure] = {}
+    pending = [tuple(args) for args in jobs]
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for attempt in range(1, retries + 2):
+            if attempt > 1:
+                wait = backoff * 2 ** (attempt - 2)
+                logger.info(f"Retrying {len(pending)} jobs in {wait:.1f}s")
+                time.sleep(wait)
+            errors = executor.map(lambda args: _attempt(func, args), pending)
+            retry = []
+            for args, error in zip(pending, errors):
+                finished = True
+                if error is None:
+                    completed.append(args)
+                    failed.pop(args, None)
+                elif isinstance(error, SystemExit):
+                    skipped.append(args)
+                else:
+                    retryable, status = _is_retryable(error)
+                    failed[args] = Failure(
+                        args,
+                        type(error).__name__,
+                        str(error),
+                        status,
+                        retryable,
+                        attempt,
+                    )
+                    if retryable and attempt <= retries:
+                        retry.append(args)
+                        finished = False
+                if progress is not None and finished:
+                    progress.update()
+            pending = retry
+            if not pending:
+                break
+
+    result = BatchResult(completed, skipped, list(failed.values()))
+    logger.info(
+        f"Batch finished: {len(completed)} completed, {len(skipped)} skipped, "
+        f"{len(result.failed)} failed"
+    )
+    if report is not None:
+        write_report(result, report)
+    return result
+
+
+def write_report(result: BatchResult, path: str) -> None:
+    """Write a machine readable report of a batch.
+
+    Parameters
+    ----------
+    result : BatchResult
+        The outcome of ``run_batch``.
+    path : str
+        Where to write the JSON report.
+    """
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "completed": len(result.completed),
+                "skipped": [list(args) for args in result.skipped],
+                "failed": [
+                    {**failure._asdict(), "args": list(failure.args)}
+                    for failure in result.failed
+                ],
+            },
+            file,
+            indent=2,
+        )
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""A revalidating HTTP cache.
+
+GTEx and BioMart answer in verbose TSV.
+``CachingAdapter`` keeps each response on disk,
+in the same store as ``gtexquery.multithreading.replay``,
+and serves it directly while it is younger than ``ttl``.
+Once it expires,
+the request is sent again with the stored ``ETag`` and ``Last-Modified``
+validators.
+If the server answers ``304 Not Modified``,
+the stored body is reused and nothing is downloaded.
+The body is still parsed again:
+every snakemake job is a fresh process,
+so a parse memo would only help the long-lived daemon and workers,
+where it would keep whole responses alive.
+
+Compressed transfer needs no extra work:
+``requests`` already sends ``Accept-Encoding: gzip, deflate``
+and decodes the response transparently.
+The adapter does, however, record what compression and caching save,
+in ``gtexquery.logs.metrics``:
+
+- ``bytes_transferred``: bytes received over the network.
+- ``bytes_decoded``: the size of those bodies once decoded.
+- ``bytes_saved``: bytes served from the cache instead of the network.
+- ``cache_hits`` and ``cache_revalidated``: responses served from the cache,
+  without and with a conditional request.
+
+The sessions created by ``_get_session`` mount the adapter when
+``GTEXQUERY_CACHE_DIR`` is set.
+``GTEXQUERY_CACHE_TTL`` sets the lifetime in seconds,
+defaulting to a day.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Optional
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+
+from ..logs import metrics
+from .replay import Cassette, Recording, _build_response, fingerprint
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+    from requests import PreparedRequest, Response
+
+logger = logging.getLogger(__name__)
+
+
+def _record_transfer(response: Response) -> None:
+    """Read a network response, recording its bytes before and after decoding.
+
+    The undecoded body is read first and counted,
+    then decoded as ``requests`` would have,
+    so compressed bodies sent without a ``Content-Length`` -
+    chunked, for instance -
+    are counted as they came over the wire.
+
+    Parameters
+    ----------
+    response : Response
+        A response from the network, not yet read.
+    """
+    raw = response.raw
+    if isinstance(raw, HTTPResponse):
+        encoded = b"".join(raw.stream(decode_content=False))
+        response.raw = HTTPResponse(
+            body=BytesIO(encoded),
+            headers=raw.headers,
+            status=raw.status,
+            preload_content=False,
+            decode_content=True,
+        )
+        transferred = len(encoded)
+        decoded = len(response.content)
+    else:
+        # adapters that decode for themselves, such as HTTP2Adapter
+        decoded = len(response.content)
+        length = response.headers.get("Content-Length")
+        compressed = response.headers.get("Content-Encoding")
+        transferred = int(length) if length and compressed else decoded
+    metrics.increment("bytes_transferred", transferred)
+    metrics.increment("bytes_decoded", decoded)
+
+
+class CachingAdapter(BaseAdapter):
+    """A transport adapter that caches and revalidates GET responses.
+
+    Parameters
+    ----------
+    cassette : Cassette
+        Where responses are stored.
+    ttl : float
+        The seconds for which a stored response is served without
+        revalidation.
+    inner : Optional[BaseAdapter]
+        The adapter used to reach the network.
+        Defaults to a new ``HTTPAdapter``.
+    """
+
+    def __init__(
+        self, cassette: Cassette, ttl: float, inner: Optional[BaseAdapter] = None
+    ) -> None:
+        super().__init__()
+        self.cassette = cassette
+        self.ttl = ttl
+        self.inner = inner or HTTPAdapter()
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:  # type: ignore
+        """Answer a request from the cache, revalidating it if needed.
+
+        Parameters
+        ----------
+        request : PreparedRequest
+            The request.
+        **kwargs : Any
+            Passed on to the inner adapter.
+
+        Returns
+        -------
+        Response
+            Responses served from the cache have ``from_cache`` set to True.
+        """
+        if request.method != "GET":
+            return self.inner.send(request, **kwargs)
+
+        key = fingerprint("GET", request.url or "")
+        stored = self.cassette.load(key)
+        age = self.cassette.age(key)
+        if stored is not None and age is not None and age <= self.ttl:
+            metrics.increment("cache_hits")
+            metrics.increment("bytes_saved", len(stored.body))
+            return self._from_cache(request, stored)
+
+        if stored is not None:
+            request = request.copy()
+            headers = {k.lower(): v for k, v in stored.headers.items()}
+            if "etag" in headers:
+                request.headers["If-None-Match"] = headers["etag"]
+            if "last-modified" in headers:
+                request.headers["If-Modified-Since"] = headers["last-modified"]
+
+        response = self.inner.send(request, **kwargs)
+        if stored is not None and response.status_code == 304:
+            self.cassette.touch(key)
+            metrics.increment("cache_revalidated")
+            metrics.increment("bytes_saved", len(stored.body))
+            return self._from_cache(request, stored)
+
+        _record_transfer(response)
+        if response.ok:
+            self.cassette.save(
+                key, response.status_code, response.headers, response.content
+            )
+        return response
+
+    @staticmethod
+    def _from_cache(request: PreparedRequest, stored: Recording) -> Response:
+        response = _build_response(request, stored)
+        response.from_cache = True  # type: ignore
+        return response
+
+    def close(self) -> None:
+        """Close the inner adapter."""
+        self.inner.close()
+
+
+def mount_from_env(session: requests.Session) -> None:
+    """Mount a ``CachingAdapter`` if the environment asks for one.
+
+    Parameters
+    ----------
+    session : requests.Session
+        The session to configure.
+    """
+    path = os.environ.get("GTEXQUERY_CACHE_DIR")
+    if not path:
+        return
+    ttl = float(os.environ.get("GTEXQUERY_CACHE_TTL", 86400))
+    cassette = Cassette(path)
+    for prefix in ("http://", "https://"):
+        session.mount(
+            prefix, CachingAdapter(cassette, ttl, session.get_adapter(prefix))
+        )
+    logger.info(f"HTTP responses are cached in {cassette.path} for {ttl}s")
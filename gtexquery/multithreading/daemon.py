@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+r"""A long-lived worker that pipeline jobs submit to.
+
+Every snakemake job is a fresh process.
+Even with lazy imports,
+each one opens new connections to GTEx and BioMart,
+and the *process* step reloads the MANE annotations.
+When there are thousands of genes,
+this overhead dominates.
+
+Instead,
+a single daemon can be started for the duration of a run.
+It keeps a pool of worker threads -
+each with its warm, thread local ``requests.Session`` -
+together with the LUT and MANE tables in memory.
+Jobs then become thin clients,
+sending one line of JSON over a Unix socket and waiting for the reply:
+
+.. code-block:: python
+
+   from gtexquery.multithreading.daemon import submit
+
+   gene = submit("gtexquery.sock", "lut", gene="DLX1")
+   submit("gtexquery.sock", "request", region="Brain_Hypothalamus", gene=gene,
+          output="DLX1.csv")
+
+The client only needs the standard library,
+so a job that submits work imports neither pandas nor requests.
+
+Start the daemon with:
+
+.. code-block:: shell
+
+   python -m gtexquery.multithreading.daemon gtexquery.sock --lut lut.csv \
+       --mane mane.csv --workers 8
+
+Attributes
+----------
+OPERATIONS : dict[str, str]
+    Map of the operations a client can request to the ``Daemon`` method that
+    handles them.
+"""
+from __future__ import annotations
+
+import argparse
+import errno
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS: dict[str, str] = {
+    "ping": "ping",
+    "lut": "convert",
+    "request": "request",
+    "biomart": "biomart",
+    "merge": "merge",
+    "shutdown": "stop",
+}
+
+
+class DaemonError(RuntimeError):
+    """An operation failed inside the daemon.
+
+    Parameters
+    ----------
+    error : str
+        The name of the exception raised in the daemon.
+    message : str
+        The message of the exception raised in the daemon.
+    """
+
+    def __init__(self, error: str, message: str) -> None:
+        super().__init__(f"{error}: {message}")
+        self.error = error
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer newline delimited JSON requests on a single connection."""
+
+    server: Daemon
+
+    def handle(self) -> None:
+        """Dispatch each request to the worker pool and write the reply."""
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+                result = self.server.executor.submit(
+                    self.server.dispatch, message["op"], message.get("kwargs", {})
+                ).result()
+            except Exception as e:
+                reply = {"ok": False, "error": type(e).__name__, "message": str(e)}
+            else:
+                reply = {"ok": True, "result": result}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove a socket nothing is listening on.
+
+    Any other kind of file is left in place,
+    for the bind to fail on.
+
+    Parameters
+    ----------
+    path : str
+        The path to the socket.
+
+    Raises
+    ------
+    OSError
+        If a server is listening on the socket.
+    """
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(errno.EADDRINUSE, f"A daemon is already listening on {path}")
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve the pipeline steps over a Unix socket.
+
+    Requests are executed on a fixed ``ThreadPoolExecutor``,
+    rather than the per-connection threads of the server,
+    so that the thread local sessions survive from one job to the next.
+
+    Parameters
+    ----------
+    socket_path : str
+        Where to create the socket.
+        A stale socket at this path is replaced,
+        but the daemon refuses to start if a server answers on it,
+        and any other file is left alone for the bind to fail on.
+        The socket is only accessible to its owner.
+    lut : Optional[pd.DataFrame]
+        The name-to-id table used by the ``lut`` operation.
+    mane : Optional[pd.DataFrame]
+        The MANE annotations used by the ``merge`` operation.
+        Its IDs are normalised once, on start up.
+    workers : int
+        The number of worker threads.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        lut: Optional[pd.DataFrame] = None,
+        mane: Optional[pd.DataFrame] = None,
+        workers: int = 8,
+    ) -> None:
+        _remove_stale_socket(socket_path)
+        # set before binding, as a failed bind calls server_close
+        self.socket_path = socket_path
+        self._bound: Optional[tuple[int, int]] = None
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        super().__init__(socket_path, _Handler)
+        self.lut = lut
+        if mane is not None:
+            from ..data_handling.ids import normalize_ids
+            from ..data_handling.schema import apply_schema
+
+            mane = apply_schema(normalize_ids(mane))
+        self.mane = mane
+
+    def server_bind(self) -> None:
+        """Create the socket, only accessible to its owner."""
+        # clients can have files written as the daemon user,
+        # so the socket must never be open to others, even briefly
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        bound = os.stat(self.socket_path)
+        self._bound = (bound.st_dev, bound.st_ino)
+
+    def dispatch(self, op: str, kwargs: dict[str, Any]) -> Any:
+        """Run a single operation.
+
+        Parameters
+        ----------
+        op : str
+            The operation to run.
+            Must be a key of ``OPERATIONS``.
+        kwargs : dict[str, Any]
+            Keyword arguments for the operation.
+
+        Returns
+        -------
+        Any
+            The JSON serialisable result of the operation.
+
+        Raises
+        ------
+        ValueError
+            If the operation is unknown.
+        """
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation {op}")
+        return getattr(self, OPERATIONS[op])(**kwargs)
+
+    def ping(self) -> str:
+        """Check the daemon is alive.
+
+        Returns
+        -------
+        str
+            Always "pong".
+        """
+        return "pong"
+
+    def convert(self, gene: str) -> str:
+        """Convert a gene name to its Ensembl ID with the warm LUT.
+
+        Parameters
+        ----------
+        gene : str
+            The gene name.
+
+        Returns
+        -------
+        str
+            The result of ``lut_check``.
+
+        Raises
+        ------
+        ValueError
+            If the daemon was started without a LUT.
+        """
+        from ..data_handling.request import lut_check
+
+        if self.lut is None:
+            raise ValueError("The daemon was started without a LUT")
+        return lut_check(gene, self.lut)
+
+    def request(self, region: str, gene: str, output: str) -> bool:
+        """Run ``gtex_request``.
+
+        Parameters
+        ----------
+        region : str
+            The GTEx region to query.
+        gene : str
+            The ENSG to query.
+        output : str
+            Where to save the output file.
+
+        Returns
+        -------
+        bool
+            False if the gene was skipped, True otherwise.
+        """
+        from ..data_handling.request import gtex_request
+
+        try:
+            gtex_request(region, gene, output)
+        except SystemExit:
+            return False
+        return True
+
+    def biomart(self, infile: str, output: str) -> bool:
+        """Run ``biomart_request``.
+
+        Parameters
+        ----------
+        infile : str
+            The output of the *request* step.
+        output : str
+            Where to save results.
+
+        Returns
+        -------
+        bool
+            Always True.
+        """
+        from ..data_handling.biomart import biomart_request
+
+        biomart_request(infile, output)
+        return True
+
+    def merge(self, gtex_path: str, bm_path: str, out_path: str) -> bool:
+        """Run ``merge_data`` against the warm MANE table.
+
+        Parameters
+        ----------
+        gtex_path : str
+            The output of the *request* step.
+        bm_path : str
+            The output of the *biomart* step.
+        out_path : str
+            Where to save results.
+
+        Returns
+        -------
+        bool
+            Always True.
+
+        Raises
+        ------
+        ValueError
+            If the daemon was started without a MANE table.
+        """
+        from ..data_handling.process import merge_data
+
+        if self.mane is None:
+            raise ValueError("The daemon was started without a MANE table")
+        merge_data(gtex_path, bm_path, self.mane, out_path)
+        return True
+
+    def stop(self) -> bool:
+        """Stop serving once the current request is answered.
+
+        Returns
+        -------
+        bool
+            Always True.
+        """
+        threading.Thread(target=self.shutdown, daemon=True).start()
+        return True
+
+    def server_close(self) -> None:
+        """Close the server, its worker pool, and remove its socket.
+
+        The socket is only removed if it is still the one this daemon bound,
+        rather than one since created at the same path.
+        """
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        try:
+            current = os.stat(self.socket_path)
+        except FileNotFoundError:
+            return
+        if (current.st_dev, current.st_ino) == self._bound:
+            os.unlink(self.socket_path)
+
+
+def submit(socket_path: str, op: str, **kwargs: Any) -> Any:
+    """Submit an operation to a running daemon and wait for the result.
+
+    Parameters
+    ----------
+    socket_path : str
+        The socket the daemon is listening on.
+    op : str
+        The operation to run.
+        See ``OPERATIONS``.
+    **kwargs : Any
+        Keyword arguments for the operation.
+
+    Returns
+    -------
+    Any
+        The result of the operation.
+
+    Raises
+    ------
+    DaemonError
+        If the operation failed inside the daemon.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps({"op": op, "kwargs": kwargs}).encode() + b"\n")
+            stream.flush()
+            reply = json.loads(stream.readline())
+    if not reply["ok"]:
+        raise DaemonError(reply["error"], reply["message"])
+    return reply["result"]
+
+
+def main() -> None:
+    """Start a daemon from the command line."""
+    parser = argparse.ArgumentParser(description="Serve GTExQuery over a socket.")
+    parser.add_argument("socket", help="Where to create the socket")
+    parser.add_argument("--lut", help="CSV of gene names (name) and Ensembl IDs (id)")
+    parser.add_argument("--mane", help="CSV of MANE annotations")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    from ..data_handling.schema import read_frame
+
+    lut = pd.read_csv(args.lut) if args.lut else None
+    mane = read_frame(args.mane) if args.mane else None
+    with Daemon(args.socket, lut=lut, mane=mane, workers=args.workers) as daemon:
+        logger.info(f"Serving on {args.socket}")
+        daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
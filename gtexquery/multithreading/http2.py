@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""An HTTP/2 transport for the thread local sessions.
+
+Each thread's ``requests.Session`` keeps its own HTTP/1.1 connections,
+so a pool of many threads opens many connections to the same host,
+each paying for its own handshake
+and carrying only one request at a time.
+Servers that cap connections per client then stall the surplus threads.
+
+``HTTP2Adapter`` instead sends every session's requests through one
+``httpx.AsyncClient`` shared by the whole process.
+Over HTTP/2,
+the client multiplexes the requests in flight from all threads
+onto a few connections per host.
+The client runs on an event loop in a background thread,
+to which each thread hands its requests.
+A synchronous ``httpx.Client`` cannot be shared this way,
+as its threads race to number their streams
+and the server then drops the connection.
+Since it is mounted as a transport adapter,
+``gtex_request``, ``biomart_request`` and the batch executors are unchanged,
+as are the replay and cache adapters layered on top of it.
+
+The sessions created by ``_get_session`` mount the adapter when
+``GTEXQUERY_HTTP_BACKEND`` is set to ``http2``.
+``GTEXQUERY_HTTP2_CONNECTIONS`` caps the connections the client opens,
+defaulting to four.
+The backend needs ``httpx`` with its HTTP/2 support,
+which is installed with the ``http2`` extra:
+
+.. code-block:: shell
+
+   pip install 'gtexquery[http2]'
+   GTEXQUERY_HTTP_BACKEND=http2 snakemake ...
+
+``benchmarks.http2`` compares the two backends against a local server.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+
+from requests.adapters import BaseAdapter
+
+from .replay import Recording, _build_response
+
+if TYPE_CHECKING:  # pragma: no cover
+    import httpx
+    import requests
+    from requests import PreparedRequest, Response
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop running the HTTP/2 clients, starting it if needed.
+
+    Returns
+    -------
+    asyncio.AbstractEventLoop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="http2", daemon=True
+            ).start()
+        return _loop
+
+
+def shared_client() -> httpx.AsyncClient:
+    """Return the process wide HTTP/2 client, creating it if needed.
+
+    Returns
+    -------
+    httpx.AsyncClient
+
+    Raises
+    ------
+    ImportError
+        If ``httpx`` or its HTTP/2 support is not installed.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            try:
+                import h2  # noqa: F401
+                import httpx
+            except ImportError as e:
+                raise ImportError(
+                    "The HTTP/2 backend needs the http2 extra: pip install 'gtexquery[http2]'"
+                ) from e
+            connections = int(os.environ.get("GTEXQUERY_HTTP2_CONNECTIONS", 4))
+            _client = httpx.AsyncClient(
+                http2=True, limits=httpx.Limits(max_connections=connections)
+            )
+        return _client
+
+
+class HTTP2Adapter(BaseAdapter):
+    """A transport adapter that sends requests through an ``httpx.AsyncClient``.
+
+    Parameters
+    ----------
+    client : Optional[httpx.AsyncClient]
+        The client to send requests through,
+        on the event loop of the module's background thread.
+        Defaults to the process wide client from ``shared_client``,
+        so that every session shares its connections.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None) -> None:
+        super().__init__()
+        self.client = client or shared_client()
+
+    def send(  # type: ignore
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        **kwargs: Any,
+    ) -> Response:
+        """Send a request.
+
+        Parameters
+        ----------
+        request : PreparedRequest
+            The request.
+        stream : bool
+            Ignored, the body is always read in full.
+        timeout : Any
+            A ``requests`` timeout,
+            either seconds or a ``(connect, read)`` tuple.
+        **kwargs : Any
+            Ignored, the client's own settings apply.
+
+        Returns
+        -------
+        Response
+
+        Raises
+        ------
+        Timeout
+            If the request timed out.
+        ConnectionError
+            If the connection failed.
+        """
+        import httpx
+        from requests.exceptions import ConnectionError, Timeout
+
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(None, connect=timeout[0], read=timeout[1])
+        body = request.body.encode() if isinstance(request.body, str) else request.body
+        sending = self.client.request(
+            request.method or "GET",
+            request.url or "",
+            headers=dict(request.headers),
+            content=body,
+            timeout=timeout,
+        )
+        try:
+            reply = asyncio.run_coroutine_threadsafe(sending, _event_loop()).result()
+        except httpx.TimeoutException as e:
+            raise Timeout(e, request=request) from e
+        except httpx.TransportError as e:
+            raise ConnectionError(e, request=request) from e
+
+        # the body is already decoded, the headers are kept for byte accounting
+        response = _build_response(
+            request,
+            Recording(reply.status_code, dict(reply.headers), reply.content),
+        )
+        response.reason = reply.reason_phrase
+        return response
+
+    def close(self) -> None:
+        """Leave the client open, it is shared with other sessions."""
+
+
+def mount_from_env(session: requests.Session) -> None:
+    """Mount an ``HTTP2Adapter`` if the environment asks for one.
+
+    Parameters
+    ----------
+    session : requests.Session
+        The session to configure.
+
+    Raises
+    ------
+    ValueError
+        If ``GTEXQUERY_HTTP_BACKEND`` names an unknown backend.
+    """
+    backend = os.environ.get("GTEXQUERY_HTTP_BACKEND", "http1")
+    if backend == "http1":
+        return
+    if backend != "http2":
+        raise ValueError(f"Unknown HTTP backend {backend}, expected http1 or http2")
+    adapter = HTTP2Adapter()
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, adapter)
+    logger.info("HTTP requests are multiplexed over HTTP/2")
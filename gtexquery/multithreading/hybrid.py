@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""Hybrid thread and process execution.
+
+Waiting on GTEx and BioMart is I/O bound,
+and so is well served by threads.
+Parsing the responses and merging the results with pandas, however,
+holds the GIL.
+Once responses arrive quickly -
+from a cache or an offline backend -
+these steps serialise across threads and leave all but one core idle.
+
+``hybrid_map`` splits each unit of work in two:
+a *fetch* run on a ``ThreadPoolExecutor``,
+and a *parse* run on a ``ProcessPoolExecutor``.
+Each parse is submitted as soon as its fetch returns,
+so network waits and CPU work overlap.
+The parse functions used here write their output in the worker process
+and return only the path,
+so no frame is pickled back to the parent at all.
+
+``merge_many`` applies the same idea to the *process* step,
+which is CPU bound throughout.
+The MANE table is sent to each worker once, on start up,
+rather than with every task.
+
+The worker processes are started by a fork server where available.
+The pool starts its workers lazily,
+while the fetch threads are mid-request,
+and forking a process with live threads can copy locks in a held state -
+those of the ``urllib3`` connection pools or of ``logging``, for instance.
+Workers started this way do not inherit the parent's logging handlers,
+so they send their records back through a queue,
+and the parent writes them with its own handlers.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
+
+    from ..logs.progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+_worker_mane: Optional[pd.DataFrame] = None
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    """Choose how worker processes are started.
+
+    Returns
+    -------
+    multiprocessing.context.BaseContext
+        The fork server context where available,
+        otherwise the platform default.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context()
+
+
+def _init_worker(
+    queue: multiprocessing.Queue, level: int, mane: Optional[pd.DataFrame]
+) -> None:
+    """Send a worker's log records to the parent and store the MANE table.
+
+    Parameters
+    ----------
+    queue : multiprocessing.Queue
+        The queue read by the parent.
+    level : int
+        The level of the parent's root logger.
+    mane : Optional[pd.DataFrame]
+        The MANE annotations, if the worker merges.
+    """
+    global _worker_mane
+    root = logging.getLogger()
+    # a forked worker inherits the parent's handlers, which would write twice
+    root.handlers = [QueueHandler(queue)]
+    root.setLevel(level)
+    _worker_mane = mane
+
+
+@contextmanager
+def _process_pool(
+    processes: Optional[int], mane: Optional[pd.DataFrame] = None
+) -> Iterator[ProcessPoolExecutor]:
+    """Start a process pool whose workers log through the parent's handlers.
+
+    Parameters
+    ----------
+    processes : Optional[int]
+        The number of processes.
+    mane : Optional[pd.DataFrame]
+        The MANE annotations to store in each worker.
+
+    Yields
+    ------
+    ProcessPoolExecutor
+        The pool, shut down and its log listener stopped on exit.
+    """
+    context = _mp_context()
+    queue = context.Queue()
+    root = logging.getLogger()
+    listener = QueueListener(queue, *root.handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(queue, root.level, mane),
+        ) as pool:
+            yield pool
+    finally:
+        # written once the workers have exited and flushed the queue
+        listener.stop()
+
+
+def hybrid_map(
+    fetch: Callable[..., Any],
+    parse: Callable[..., Any],
+    jobs: Iterable[tuple[Sequence[Any], Sequence[Any]]],
+    threads: int = 8,
+    processes: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> list[Any]:
+    """Fetch on threads, then parse on processes.
+
+    Parameters
+    ----------
+    fetch : Callable[..., Any]
+        The I/O bound function.
+        Called as ``fetch(*fetch_args)`` on a thread.
+    parse : Callable[..., Any]
+        The CPU bound function.
+        Called as ``parse(payload, *parse_args)`` in a process,
+        where ``payload`` is the return value of ``fetch``.
+        It must be picklable - a module level function.
+    jobs : Iterable[tuple[Sequence[Any], Sequence[Any]]]
+        Pairs of ``(fetch_args, parse_args)``.
+    threads : int
+        The number of threads.
+    processes : Optional[int]
+        The number of processes.
+        Defaults to the number of CPUs.
+    progress : Optional[ProgressReporter]
+        If given,
+        it is updated as each parse completes.
+
+    Returns
+    -------
+    list[Any]
+        The return values of ``parse``, in the order of ``jobs``.
+    """
+    jobs = list(jobs)
+    with _process_pool(processes) as cpu, ThreadPoolExecutor(max_workers=threads) as io:
+        fetches = {
+            io.submit(fetch, *fetch_args): i for i, (fetch_args, _) in enumerate(jobs)
+        }
+        parses: dict[int, Future] = {}
+        for fetched in as_completed(fetches):
+            i = fetches[fetched]
+            parses[i] = cpu.submit(parse, fetched.result(), *jobs[i][1])
+            if progress is not None:
+                parses[i].add_done_callback(lambda _: progress.update())
+        return [parses[i].result() for i in range(len(jobs))]
+
+
+def _no_fetch(*args: Any) -> None:
+    """Fetch nothing, for units answered from local tables.
+
+    Parameters
+    ----------
+    *args : Any
+        Ignored.
+    """
+
+
+def _request_in_worker(
+    response: Optional[str],
+    region: str,
+    gene: str,
+    output: str,
+    prefetched: Optional[str],
+) -> str:
+    """Run ``gtex_request`` on a response fetched by a thread.
+
+    Parameters
+    ----------
+    response : Optional[str]
+        The body of the response,
+        or None if the gene is answered from ``prefetched``.
+    region : str
+        The GTEx region queried.
+    gene : str
+        The ENSG queried.
+    output : str
+        Where to save the output file.
+    prefetched : Optional[str]
+        A tissue table for ``region``.
+
+    Returns
+    -------
+    str
+        The output file.
+    """
+    from ..data_handling.request import gtex_request
+
+    gtex_request(region, gene, output, prefetched, response)
+    return output
+
+
+def gtex_requests(
+    jobs: Iterable[tuple[str, str, str]],
+    threads: int = 8,
+    processes: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+    prefetched: Optional[str] = None,
+) -> list[str]:
+    """Run the *request* step for many genes.
+
+    Genes that do not start with "ENSG" are logged and skipped,
+    as they are by ``gtex_request``.
+
+    Parameters
+    ----------
+    jobs : Iterable[tuple[str, str, str]]
+        Triples of ``(region, gene, output)``,
+        as passed to ``gtex_request``.
+    threads : int
+        The number of threads for the GTEx queries.
+    processes : Optional[int]
+        The number of processes for parsing.
+    progress : Optional[ProgressReporter]
+        If given,
+        it is updated as each gene is written or skipped.
+    prefetched : Optional[str]
+        A tissue table to answer every gene from,
+        as passed to ``gtex_request``.
+
+    Returns
+    -------
+    list[str]
+        The files written.
+    """
+    from ..data_handling.request import _fetch_gtex
+
+    valid = []
+    for region, gene, output in jobs:
+        if gene.startswith("ENSG"):
+            valid.append(((region, gene), (region, gene, output, prefetched)))
+        else:
+            logger.warning(
+                f"{gene} was not found in Gencode. "
+                "It will be skipped in further analysis."
+            )
+            if progress is not None:
+                progress.update()
+    fetch = _fetch_gtex if prefetched is None else _no_fetch
+    return hybrid_map(fetch, _request_in_worker, valid, threads, processes, progress)
+
+
+def _biomart_in_worker(
+    response: Optional[str], infile: str, output: str, mapping: Optional[str]
+) -> str:
+    """Run ``biomart_request`` on a response fetched by a thread.
+
+    Parameters
+    ----------
+    response : Optional[str]
+        The body of the response,
+        or None if the transcripts are looked up in ``mapping``.
+    infile : str
+        The output of the *request* step.
+    output : str
+        Where to save results.
+    mapping : Optional[str]
+        A local Ensembl export.
+
+    Returns
+    -------
+    str
+        The output file.
+    """
+    from ..data_handling.biomart import biomart_request
+
+    biomart_request(infile, output, mapping, response)
+    return output
+
+
+def biomart_requests(
+    jobs: Iterable[tuple[str, str]],
+    threads: int = 8,
+    processes: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+    mapping: Optional[str] = None,
+) -> list[str]:
+    """Run the *biomart* step for many files.
+
+    Parameters
+    ----------
+    jobs : Iterable[tuple[str, str]]
+        Pairs of ``(infile, output)``,
+        as passed to ``biomart_request``.
+    threads : int
+        The number of threads for the BioMart queries.
+    processes : Optional[int]
+        The number of processes for parsing.
+    progress : Optional[ProgressReporter]
+        If given,
+        it is updated as each file is written.
+    mapping : Optional[str]
+        A local Ensembl export to look every file up in,
+        as passed to ``biomart_request``.
+
+    Returns
+    -------
+    list[str]
+        The files written.
+    """
+    from ..data_handling.biomart import _fetch_biomart
+
+    return hybrid_map(
+        _fetch_biomart if mapping is None else _no_fetch,
+        _biomart_in_worker,
+        (((infile,), (infile, output, mapping)) for infile, output in jobs),
+        threads,
+        processes,
+        progress,
+    )
+
+
+def _merge_in_worker(gtex_path: str, bm_path: str, out_path: str) -> str:
+    """Run ``merge_data`` against the MANE table stored in this worker.
+
+    Parameters
+    ----------
+    gtex_path : str
+        Path to the file containing GTEx query data.
+    bm_path : str
+        Path to the file containing BioMart query data.
+    out_path : str
+        Path to the output file.
+
+    Returns
+    -------
+    str
+        The output file.
+    """
+    from ..data_handling.process import merge_data
+
+    merge_data(gtex_path, bm_path, _worker_mane, out_path)  # type: ignore
+    return out_path
+
+
+def merge_many(
+    jobs: Iterable[tuple[str, str, str]],
+    mane: pd.DataFrame,
+    processes: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> list[str]:
+    """Run the *process* step for many genes on a process pool.
+
+    Parameters
+    ----------
+    jobs : Iterable[tuple[str, str, str]]
+        Triples of ``(gtex_path, bm_path, out_path)``,
+        as passed to ``merge_data``.
+    mane : pd.DataFrame
+        The MANE annotations.
+        Normalised and made compact once,
+        before being sent to the workers.
+    processes : Optional[int]
+        The number of processes.
+    progress : Optional[ProgressReporter]
+        If given,
+        it is updated as each gene is merged.
+
+    Returns
+    -------
+    list[str]
+        The files written.
+    """
+    from ..data_handling.ids import normalize_ids
+    from ..data_handling.schema import apply_schema
+
+    mane = apply_schema(normalize_ids(mane.copy()))
+    with _process_pool(processes, mane) as cpu:
+        merges = [cpu.submit(_merge_in_worker, *args) for args in jobs]
+        if progress is not None:
+            for merge in merges:
+                merge.add_done_callback(lambda _: progress.update())
+        return [merge.result() for merge in merges]
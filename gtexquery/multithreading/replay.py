@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Record and replay of HTTP traffic.
+
+Capturing the GTEx and BioMart traffic of a run once,
+and replaying it afterwards at disk speed,
+makes results reproducible offline,
+lets the CPU side of the pipeline be profiled without network noise,
+and provides fixed inputs for benchmarks.
+
+``ReplayAdapter`` is a ``requests`` transport adapter with three modes:
+
+- ``record`` sends each request and stores the response.
+- ``replay`` answers each request from the store,
+  failing with a ``requests.ConnectionError`` if it was never recorded.
+- ``passthrough`` sends each request untouched.
+
+Responses are gzipped and stored under a fingerprint of the request,
+so the store is its own index.
+The sessions created by ``_get_session`` mount the adapter when the
+``GTEXQUERY_REPLAY`` environment variable names a mode,
+storing responses in ``GTEXQUERY_REPLAY_DIR``.
+
+Record and replay only work with ``requests``:
+the adapter sees the traffic of ``requests`` sessions and nothing else,
+so requests sent by another client, such as ``aiohttp``,
+go straight to the network in every mode.
+``Cassette`` itself holds no ``requests`` specific state,
+so such a client could share the store
+by calling ``fingerprint``, ``Cassette.load`` and ``Cassette.save`` itself,
+but nothing in the package does so.
+
+Attributes
+----------
+MODES : tuple[str, ...]
+    The supported modes.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Mapping, NamedTuple, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+if TYPE_CHECKING:  # pragma: no cover
+    from requests import PreparedRequest, Response
+
+logger = logging.getLogger(__name__)
+
+MODES: tuple[str, ...] = ("record", "replay", "passthrough")
+
+# Describe the stored, decoded body - not the body on the wire
+_DROPPED_HEADERS = ("Content-Encoding", "Content-Length", "Transfer-Encoding")
+
+
+class Recording(NamedTuple):
+    """A stored response.
+
+    Attributes
+    ----------
+    status : int
+        The HTTP status code.
+    headers : dict[str, str]
+        The response headers.
+    body : bytes
+        The decoded response body.
+    """
+
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+
+def fingerprint(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """Identify a request independently of its query parameter order.
+
+    Parameters
+    ----------
+    method : str
+        The HTTP method.
+    url : str
+        The full URL, including the query string.
+    body : Optional[bytes]
+        The request body, if any.
+
+    Returns
+    -------
+    str
+        A hex digest.
+
+    Example
+    -------
+    >>> fingerprint("GET", "http://a.org/?x=1&y=2") == fingerprint(
+    ...     "GET", "http://a.org/?y=2&x=1"
+    ... )
+    True
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    canonical = urlunsplit(parts._replace(query=query))
+    digest = hashlib.sha256(f"{method.upper()} {canonical}\n".encode())
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+class Cassette:
+    """A directory of gzipped responses, keyed by request fingerprint.
+
+    Parameters
+    ----------
+    path : Union[Path, str]
+        The directory.
+        It is created if needed.
+    """
+
+    def __init__(self, path: Union[Path, str]) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.gz"
+
+    def load(self, key: str) -> Optional[Recording]:
+        """Load a stored response.
+
+        Parameters
+        ----------
+        key : str
+            The request fingerprint.
+
+        Returns
+        -------
+        Optional[Recording]
+            The response, or None if it was never recorded.
+        """
+        try:
+            with gzip.open(self._file(key), "rb") as file:
+                meta = json.loads(file.readline())
+                body = file.read()
+        except FileNotFoundError:
+            return None
+        return Recording(meta["status"], meta["headers"], body)
+
+    def age(self, key: str) -> Optional[float]:
+        """Time since a response was stored or last refreshed.
+
+        Parameters
+        ----------
+        key : str
+            The request fingerprint.
+
+        Returns
+        -------
+        Optional[float]
+            The age in seconds, or None if it was never recorded.
+        """
+        try:
+            return time.time() - self._file(key).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def touch(self, key: str) -> None:
+        """Mark a stored response as fresh.
+
+        Parameters
+        ----------
+        key : str
+            The request fingerprint.
+        """
+        self._file(key).touch()
+
+    def save(
+        self, key: str, status: int, headers: Mapping[str, str], body: bytes
+    ) -> None:
+        """Store a response.
+
+        The file is written aside and renamed into place,
+        so concurrent readers never see a partial recording.
+
+        Parameters
+        ----------
+        key : str
+            The request fingerprint.
+        status : int
+            The HTTP status code.
+        headers : Mapping[str, str]
+            The response headers.
+        body : bytes
+            The decoded response body.
+        """
+        kept = {k: v for k, v in headers.items() if k.title() not in _DROPPED_HEADERS}
+        tmp = self._file(key).with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wb") as file:
+            file.write(json.dumps({"status": status, "headers": kept}).encode() + b"\n")
+            file.write(body)
+        tmp.replace(self._file(key))
+
+
+class ReplayAdapter(BaseAdapter):
+    """A transport adapter that records or replays responses.
+
+    Parameters
+    ----------
+    cassette : Cassette
+        Where responses are stored.
+    mode : str
+        One of ``MODES``.
+    inner : Optional[BaseAdapter]
+        The adapter used to reach the network.
+        Defaults to a new ``HTTPAdapter``.
+
+    Raises
+    ------
+    ValueError
+        If ``mode`` is not one of ``MODES``.
+    """
+
+    def __init__(
+        self, cassette: Cassette, mode: str, inner: Optional[BaseAdapter] = None
+    ) -> None:
+        super().__init__()
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}, expected one of {MODES}")
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner or HTTPAdapter()
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:  # type: ignore
+        """Send, record, or replay a request.
+
+        Parameters
+        ----------
+        request : PreparedRequest
+            The request.
+        **kwargs : Any
+            Passed on to the inner adapter.
+
+        Returns
+        -------
+        Response
+
+        Raises
+        ------
+        ConnectionError
+            A ``requests.ConnectionError``,
+            when replaying a request that was never recorded.
+        """
+        if self.mode == "passthrough":
+            return self.inner.send(request, **kwargs)
+
+        body = request.body.encode() if isinstance(request.body, str) else request.body
+        key = fingerprint(request.method or "GET", request.url or "", body)
+
+        if self.mode == "replay":
+            recording = self.cassette.load(key)
+            if recording is None:
+                raise requests.ConnectionError(
+                    f"No recording for {request.method} {request.url}", request=request
+                )
+            return _build_response(request, recording)
+
+        response = self.inner.send(request, **kwargs)
+        self.cassette.save(
+            key, response.status_code, response.headers, response.content
+        )
+        return response
+
+    def close(self) -> None:
+        """Close the inner adapter."""
+        self.inner.close()
+
+
+def _build_response(request: PreparedRequest, recording: Recording) -> Response:
+    """Turn a recording back into a ``requests.Response``.
+
+    Parameters
+    ----------
+    request : PreparedRequest
+        The request being answered.
+    recording : Recording
+        The stored response.
+
+    Returns
+    -------
+    Response
+    """
+    response = requests.Response()
+    response.status_code = recording.status
+    response.headers = CaseInsensitiveDict(recording.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = recording.body
+    response.url = request.url or ""
+    response.request = request
+    return response
+
+
+def mount_from_env(session: requests.Session) -> None:
+    """Mount a ``ReplayAdapter`` if the environment asks for one.
+
+    Parameters
+    ----------
+    session : requests.Session
+        The session to configure.
+    """
+    mode = os.environ.get("GTEXQUERY_REPLAY")
+    if not mode:
+        return
+    cassette = Cassette(os.environ.get("GTEXQUERY_REPLAY_DIR", "gtexquery_replay"))
+    for prefix in ("http://", "https://"):
+        session.mount(
+            prefix, ReplayAdapter(cassette, mode, session.get_adapter(prefix))
+        )
+    logger.info(f"HTTP traffic is in {mode} mode, using {cassette.path}")
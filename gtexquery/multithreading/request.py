@@ -21,11 +21,14 @@ and mapping with ``concurrent.futures.ThreadPoolExecutor.map``.
 The call to ``concurrent.futures.ThreadPoolExecutor.map`` is handled in the analysis
 script.
 """
+from __future__ import annotations
+
 import logging
 import threading
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import requests
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
 
 thread_local = threading.local()
 logger = logging.getLogger(__name__)
@@ -41,6 +44,22 @@ def _get_session(
     To circumvent this, we create a thread local session. This means each session
     will still make multiple requests but remain isolated to its calling thread.
 
+    If ``GTEXQUERY_HTTP_BACKEND`` is ``http2``,
+    the session multiplexes its requests over shared HTTP/2 connections.
+    See ``gtexquery.multithreading.http2``.
+    If ``GTEXQUERY_REPLAY`` is set,
+    the session records or replays its traffic.
+    See ``gtexquery.multithreading.replay``.
+    If ``GTEXQUERY_CACHE_DIR`` is set,
+    the session caches and revalidates its responses.
+    See ``gtexquery.multithreading.cache``.
+    Every response is counted against its host for progress reporting.
+
+    ``headers`` and ``params`` are only applied when a thread's session is
+    first created,
+    and so persist for every later request made on that thread.
+    Anything specific to a request must be passed with the request itself.
+
     Parameters
     ----------
     headers : Optional[dict[str, str]]
@@ -54,9 +73,19 @@ def _get_session(
     """
     # session still worth it - re-used by each thread
     if not hasattr(thread_local, "session"):
+        import requests
+
         thread_local.session = requests.Session()
         if headers:
             thread_local.session.headers.update(headers)
         if params:
             thread_local.session.params.update(params)  # type: ignore
+
+        from ..logs.progress import count_response
+        from . import cache, http2, replay
+
+        http2.mount_from_env(thread_local.session)
+        replay.mount_from_env(thread_local.session)
+        cache.mount_from_env(thread_local.session)
+        thread_local.session.hooks["response"].append(count_response)
     return thread_local.session
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""Splitting a run across several nodes.
+
+A single machine is limited by its bandwidth and by per-IP rate limits.
+The functions here let several nodes that share only a filesystem
+divide a gene by tissue run between them.
+Each unit of work is a tuple of arguments for one of the step functions,
+such as ``(region, gene, output)`` for ``gtex_request``,
+and writes its usual output file on the shared filesystem.
+
+There are two strategies:
+
+- Static sharding with ``select_shard``.
+  Every unit is assigned to a shard by a hash of its arguments,
+  so each node can compute its share independently.
+- Dynamic leasing with ``run_leased``.
+  Every node works through the full list,
+  claiming each unit with a lease file before running it.
+  Leases expire,
+  so units claimed by a node that died are reclaimed by the others.
+
+Each node's failures can be reported with ``run_batch``,
+and the reports combined afterwards with ``merge_reports``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence, Union
+
+from .batch import BatchResult, run_batch, write_report
+
+logger = logging.getLogger(__name__)
+
+
+def unit_key(args: Sequence[Any]) -> str:
+    """Compute a stable key for a unit of work.
+
+    Parameters
+    ----------
+    args : Sequence[Any]
+        The arguments of the unit.
+
+    Returns
+    -------
+    str
+        A hex digest of the arguments.
+
+    Example
+    -------
+    >>> unit_key(("Brain_Hypothalamus", "ENSG00000144355.14", "DLX1.csv"))[:12]
+    'c463e527f97b'
+    """
+    return hashlib.sha256("\t".join(map(str, args)).encode()).hexdigest()
+
+
+def select_shard(jobs: Sequence[tuple], index: int, shards: int) -> list[tuple]:
+    """Select the units belonging to one shard.
+
+    The assignment depends only on the arguments of each unit,
+    so it is the same on every node and for any ordering of ``jobs``.
+
+    Parameters
+    ----------
+    jobs : Sequence[tuple]
+        Every unit in the run.
+    index : int
+        The shard to select, counting from 0.
+    shards : int
+        The total number of shards.
+
+    Returns
+    -------
+    list[tuple]
+        The units in shard ``index``.
+
+    Raises
+    ------
+    ValueError
+        If ``index`` is not a valid shard.
+    """
+    if not 0 <= index < shards:
+        raise ValueError(f"Shard {index} is not in the range 0 to {shards - 1}")
+    return [args for args in jobs if int(unit_key(args), 16) % shards == index]
+
+
+class LeaseDir:
+    """A directory of lease files on a shared filesystem.
+
+    A lease is a file created with ``O_EXCL``,
+    so only one node can hold it.
+    A lease older than ``ttl`` seconds is considered abandoned,
+    and is reclaimed by renaming it aside.
+    Another node may have reclaimed it first and taken a fresh lease,
+    in which case that fresh lease is what was renamed;
+    the reclaiming node then sees a fresh file,
+    puts it back and backs off.
+    Units that completed,
+    or that still failed after every retry,
+    are marked with a separate file,
+    so they are never run twice.
+
+    Parameters
+    ----------
+    path : Union[Path, str]
+        The lease directory.
+        It is created if needed.
+    ttl : float
+        The seconds after which a lease expires.
+    """
+
+    def __init__(self, path: Union[Path, str], ttl: float = 600) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _lease(self, args: Sequence[Any]) -> Path:
+        return self.path / f"{unit_key(args)}.lease"
+
+    def _done(self, args: Sequence[Any]) -> Path:
+        return self.path / f"{unit_key(args)}.done"
+
+    def _failed(self, args: Sequence[Any]) -> Path:
+        return self.path / f"{unit_key(args)}.failed"
+
+    def is_done(self, args: Sequence[Any]) -> bool:
+        """Check whether a unit has been completed by any node.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+
+        Returns
+        -------
+        bool
+        """
+        return self._done(args).exists()
+
+    def is_finished(self, args: Sequence[Any]) -> bool:
+        """Check whether a unit has been completed or has failed on any node.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+
+        Returns
+        -------
+        bool
+        """
+        return self.is_done(args) or self._failed(args).exists()
+
+    def is_expired(self, args: Sequence[Any]) -> bool:
+        """Check whether a unit is free to be claimed.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+
+        Returns
+        -------
+        bool
+            True if the unit has no lease, or an expired one.
+        """
+        try:
+            return time.time() - self._lease(args).stat().st_mtime > self.ttl
+        except FileNotFoundError:
+            return True
+
+    def acquire(self, args: Sequence[Any]) -> bool:
+        """Try to claim a unit.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+
+        Returns
+        -------
+        bool
+            True if this node now holds the lease.
+        """
+        if self.is_finished(args):
+            return False
+        lease = self._lease(args)
+        if lease.exists() and self.is_expired(args):
+            stale = lease.with_suffix(f".stale-{uuid.uuid4().hex}")
+            try:
+                lease.rename(stale)
+            except FileNotFoundError:
+                return False
+            if time.time() - stale.stat().st_mtime <= self.ttl:
+                # another node reclaimed it first, this is their live lease
+                try:
+                    os.link(stale, lease)
+                except FileExistsError:
+                    pass
+                stale.unlink()
+                return False
+            logger.warning(f"Reclaimed an expired lease for {list(args)}")
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as file:
+            file.write(self.owner)
+        return True
+
+    def complete(self, args: Sequence[Any]) -> None:
+        """Mark a unit as completed and drop its lease.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+        """
+        self._done(args).write_text(self.owner)
+        self.release(args)
+
+    def fail(self, args: Sequence[Any]) -> None:
+        """Mark a unit as failed for good and drop its lease.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+        """
+        self._failed(args).write_text(self.owner)
+        self.release(args)
+
+    def release(self, args: Sequence[Any]) -> None:
+        """Drop the lease on a unit without completing it.
+
+        Parameters
+        ----------
+        args : Sequence[Any]
+            The arguments of the unit.
+        """
+        self._lease(args).unlink(missing_ok=True)
+
+
+def run_leased(
+    func: Callable[..., Any],
+    jobs: Sequence[tuple],
+    lease_dir: Union[Path, str],
+    ttl: float = 600,
+    poll: float = 10,
+    report: Optional[str] = None,
+    **kwargs: Any,
+) -> BatchResult:
+    """Run a share of the units, claimed dynamically through lease files.
+
+    Every node is given the full list of units.
+    Once a node has made its pass,
+    it waits for the units still leased by other nodes,
+    reclaiming any whose lease expires.
+    A unit that still fails once ``run_batch`` has used up its retries
+    is marked as failed,
+    so it is reported by this node alone and not run again by the others.
+
+    Parameters
+    ----------
+    func : Callable[..., Any]
+        The function to call,
+        such as ``gtex_request`` or ``biomart_request``.
+    jobs : Sequence[tuple]
+        Every unit in the run.
+    lease_dir : Union[Path, str]
+        The lease directory on the shared filesystem.
+    ttl : float
+        The seconds after which a lease expires.
+        This should comfortably exceed the time taken by a single unit.
+    poll : float
+        The seconds to wait between checks on units leased by other nodes.
+    report : Optional[str]
+        If given,
+        a JSON report of this node's failures is written here.
+    **kwargs : Any
+        Passed on to ``run_batch``.
+        A ``progress`` reporter is updated once for each unit,
+        as it is finished by any node.
+
+    Returns
+    -------
+    BatchResult
+        The units completed, skipped and failed by this node.
+        Units handled by other nodes are left out,
+        so the reports of all nodes can be merged without repeats.
+    """
+    # counted here rather than by run_batch, which sees a unit on every pass
+    progress = kwargs.pop("progress", None)
+    leases = LeaseDir(lease_dir, ttl)
+
+    # units skipped by func on this node, rather than handled by another
+    skipped_here: set[tuple] = set()
+    # leases kept between the retries of a failing unit
+    held: set[tuple] = set()
+
+    def leased(*args: Any) -> None:
+        if args not in held and not leases.acquire(args):
+            raise SystemExit
+        # a failure keeps the lease, for run_batch to retry
+        held.add(args)
+        try:
+            func(*args)
+        except SystemExit:
+            skipped_here.add(args)
+            held.discard(args)
+            leases.complete(args)
+            raise
+        held.discard(args)
+        leases.complete(args)
+
+    completed: list[tuple] = []
+    failed = []
+    pending = [tuple(args) for args in jobs]
+    while pending:
+        result = run_batch(leased, pending, **kwargs)
+        completed.extend(result.completed)
+        failed.extend(result.failed)
+        for failure in result.failed:
+            held.discard(failure.args)
+            leases.fail(failure.args)
+        remaining = [args for args in pending if not leases.is_finished(args)]
+        if progress is not None:
+            progress.update(len(pending) - len(remaining))
+        pending = remaining
+        if pending and not any(leases.is_expired(args) for args in pending):
+            logger.info(f"Waiting on {len(pending)} units leased by other nodes")
+            time.sleep(poll)
+
+    skipped = [tuple(args) for args in jobs if tuple(args) in skipped_here]
+    result = BatchResult(completed, skipped, failed)
+    if report is not None:
+        write_report(result, report)
+    return result
+
+
+def merge_reports(
+    reports: Sequence[Union[Path, str]], output: Union[Path, str]
+) -> None:
+    """Combine the failure reports written by several nodes.
+
+    Parameters
+    ----------
+    reports : Sequence[Union[Path, str]]
+        The reports written by ``run_batch`` on each node.
+    output : Union[Path, str]
+        Where to write the combined report.
+    """
+    combined: dict[str, Any] = {"completed": 0, "skipped": [], "failed": []}
+    for report in reports:
+        with open(report) as file:
+            contents = json.load(file)
+        for key, value in contents.items():
+            combined[key] += value
+    with open(output, "w") as file:
+        json.dump(combined, file, indent=2)
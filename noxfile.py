@@ -11,6 +11,7 @@ LOCATIONS: List[str] = [
     PACKAGE,
     "noxfile.py",
     "tests",
+    "benchmarks",
 ]
 VERSIONS: List[str] = [
     "3.9",
@@ -138,6 +139,14 @@ def doc_tests(session: Session) -> None:
         session.run(*command, x, *args)
 
 
+@nox.session(python=VERSIONS)
+def benchmark(session: Session) -> None:
+    """Time the per-job import cost of the pipeline steps."""
+    args = session.posargs or []
+    session.run("poetry", "install", "--no-dev", external=True)
+    session.run("python", "-m", "benchmarks.import_time", *args)
+
+
 @nox.session(python="3.9")
 def doc_build(session: Session) -> None:
     """Build the documentation."""
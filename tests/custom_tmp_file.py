@@ -28,6 +28,9 @@ from tempfile import NamedTemporaryFile
 from types import TracebackType
 from typing import Optional, Type
 
+import requests
+from requests.adapters import BaseAdapter
+
 BIOMART_RESPONSE = """
 HGNC symbol\tGene stable ID\tTranscript stable ID\tRefSeq mRNA ID
 DLX1\tENSG00000144355\tENST00000341900\tNM_001038493
@@ -78,6 +81,23 @@ MANE_CONTENTS = (
 )
 
 
+def adapter_session(adapter: BaseAdapter) -> requests.Session:
+    """Create a session using an adapter for all traffic.
+
+    Parameters
+    ----------
+    adapter : BaseAdapter
+        The adapter under test.
+
+    Returns
+    -------
+    requests.Session
+    """
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
 class CustomTempFile:
     """Create a temporary file with custom content.
 
@@ -9,7 +9,7 @@ import requests_mock
 from pandas.testing import assert_frame_equal
 from requests import HTTPError
 
-from gtexquery.data_handling.biomart import XML_QUERY, biomart_request
+from gtexquery.data_handling.biomart import XML_QUERY, _lookup_offline, biomart_request
 
 from ..custom_tmp_file import (
     BIOMART_CONTENTS,
@@ -53,3 +53,30 @@ def test_writes_file(tmp_path: Path) -> None:
     response = pd.read_csv(tmp_path / "output.csv")
     expected = pd.read_csv(StringIO(BIOMART_CONTENTS))
     assert_frame_equal(response, expected)
+
+
+def test_offline_matches_online(tmp_path: Path) -> None:
+    """It writes the same file from a local export as from BioMart."""
+    mapping = CustomTempFile(BIOMART_RESPONSE.lstrip())
+    with requests_mock.Mocker() as m:
+        biomart_request(
+            CustomTempFile(GTEX_CONTENTS).filename,
+            str(tmp_path / "output.csv"),
+            mapping=mapping.filename,
+        )
+    assert not m.called, "The network was used."
+    response = pd.read_csv(tmp_path / "output.csv")
+    expected = pd.read_csv(StringIO(BIOMART_CONTENTS))
+    assert_frame_equal(response, expected)
+
+
+def test_offline_lookup() -> None:
+    """It returns every row per transcript, in query order, dropping unknowns."""
+    mapping = CustomTempFile(
+        "HGNC symbol\tGene stable ID\tTranscript stable ID\tRefSeq mRNA ID\n"
+        "A\tENSG1\tENST2\tNM_3\n"
+        "A\tENSG1\tENST1\tNM_1\n"
+        "A\tENSG1\tENST1\tNM_2\n"
+    )
+    data = _lookup_offline(["ENST2", "ENST9", "ENST1"], mapping.filename)
+    assert data["refseq"].tolist() == ["NM_3", "NM_1", "NM_2"]
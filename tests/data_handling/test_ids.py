@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests for the gtexquery.data_handling.ids submodule."""
+import numpy as np
+import pandas as pd
+
+from gtexquery.data_handling.ids import normalize_ids
+
+
+def test_strips_versions() -> None:
+    """It strips the version from every ID column."""
+    data = pd.DataFrame(
+        {
+            "gencodeId": ["ENSG00000144355.14", "ENSG00000144355.14"],
+            "transcriptId": ["ENST00000341900.6", "ENST00000361609"],
+        }
+    )
+    normalize_ids(data)
+    assert data["gencodeId"].tolist() == ["ENSG00000144355", "ENSG00000144355"]
+    assert data["transcriptId"].tolist() == ["ENST00000341900", "ENST00000361609"]
+
+
+def test_keeps_versions() -> None:
+    """It keeps the versions in a separate column when asked."""
+    data = pd.DataFrame({"transcriptId": ["ENST00000341900.6", "ENST00000361609"]})
+    normalize_ids(data, keep_version=True)
+    assert data["transcriptIdVersion"].tolist() == ["6", np.nan]
+
+
+def test_preserves_missing() -> None:
+    """It preserves missing IDs."""
+    data = pd.DataFrame({"gencodeId": [np.nan, "ENSG00000144355.14"]})
+    normalize_ids(data)
+    assert data["gencodeId"].isna().tolist() == [True, False]
+
+
+def test_handles_categorical() -> None:
+    """It normalises categorical columns."""
+    data = pd.DataFrame(
+        {"gencodeId": pd.Categorical(["ENSG00000144355.14", "ENSG00000144355.15"])}
+    )
+    normalize_ids(data)
+    assert data["gencodeId"].cat.categories.tolist() == ["ENSG00000144355"]
+
+
+def test_normalises_reassigned() -> None:
+    """It normalises a column again after it is reassigned."""
+    data = pd.DataFrame({"gencodeId": ["ENSG00000144355.14"]})
+    normalize_ids(data)
+    data["gencodeId"] = ["ENSG00000139352.3"]
+    normalize_ids(data)
+    assert data["gencodeId"].tolist() == ["ENSG00000139352"]
+
+
+def test_normalises_merged() -> None:
+    """Frames derived from a normalised one are normalised again."""
+    data = pd.DataFrame({"gencodeId": ["ENSG00000144355.14"], "key": [1]})
+    normalize_ids(data)
+    other = pd.DataFrame({"key": [1], "gencodeId": ["ENSG00000139352.3"]})
+    merged = normalize_ids(data[["key"]].merge(other, on="key"))
+    assert merged["gencodeId"].tolist() == ["ENSG00000139352"]
+
+
+def test_categorises_unversioned() -> None:
+    """Columns without versions are left as they are, but made categorical."""
+    data = pd.DataFrame({"gencodeId": ["ENSG00000144355", np.nan]})
+    normalize_ids(data)
+    assert data["gencodeId"].dtype == "category"
+    assert data["gencodeId"].tolist() == ["ENSG00000144355", np.nan]
+
+
+def test_handles_empty() -> None:
+    """It accepts a frame without rows."""
+    data = pd.DataFrame({"gencodeId": pd.Series([], dtype=object)})
+    normalize_ids(data, keep_version=True)
+    assert data["gencodeId"].empty
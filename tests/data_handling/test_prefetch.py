@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Tests for the gtexquery.data_handling.prefetch submodule."""
+import os
+from contextlib import nullcontext
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import requests_mock
+from pandas.testing import assert_frame_equal
+
+from gtexquery.data_handling.prefetch import lookup, prefetch_offline, prefetch_tissue
+from gtexquery.data_handling.request import gtex_request
+
+from ..custom_tmp_file import GTEX_CONTENTS, GTEX_RESPONSE, CustomTempFile
+
+URL = "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression"
+
+
+@pytest.fixture
+def table(tmp_path: Path) -> str:
+    """Prefetch a tissue from a mocked GTEx.
+
+    Parameters
+    ----------
+    tmp_path : Path
+        pytest fixture for temporary path
+
+    Returns
+    -------
+    str
+        The path to the tissue table.
+    """
+    path = str(tmp_path / "tissue.pkl")
+    with requests_mock.Mocker() as m:
+        m.get(URL, text=GTEX_RESPONSE)
+        prefetch_tissue("Brain_Hypothalamus", ["ENSG00000144355.14", "phony"], path)
+    return path
+
+
+def test_batches_genes(tmp_path: Path) -> None:
+    """It requests genes in batches."""
+    genes = [f"ENSG{i}" for i in range(5)]
+    with requests_mock.Mocker() as m:
+        m.get(URL, text=GTEX_RESPONSE)
+        prefetch_tissue("Brain_Hypothalamus", genes, tmp_path / "t.pkl", batch_size=2)
+    assert m.call_count == 3
+    assert m.request_history[0].qs["gencodeid"] == ["ensg0,ensg1"]
+
+
+def test_answers_from_table(table: str, tmp_path: Path) -> None:
+    """It writes the same file as a live request, without the network."""
+    output = tmp_path / "DLX1.csv"
+    with requests_mock.Mocker() as m:
+        gtex_request("Brain_Hypothalamus", "ENSG00000144355.14", str(output), table)
+    assert not m.called, "The network was used."
+    assert_frame_equal(pd.read_csv(output), pd.read_csv(StringIO(GTEX_CONTENTS)))
+
+
+def test_missing_gene(table: str) -> None:
+    """It returns no rows for a gene missing from the table."""
+    assert lookup(table, "Brain_Hypothalamus", "ENSG0").empty
+
+
+def test_reloads_rewritten(tmp_path: Path) -> None:
+    """It reads a table again once it is rewritten."""
+    path = str(tmp_path / "tissue.pkl")
+    prefetch_offline("Brain_Hypothalamus", CustomTempFile(GTEX_RESPONSE).filename, path)
+    assert len(lookup(path, "Brain_Hypothalamus", "ENSG00000144355")) == 7
+    mtime = os.stat(path).st_mtime_ns
+    prefetch_tissue("Brain_Hypothalamus", [], path)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    assert lookup(path, "Brain_Hypothalamus", "ENSG00000144355").empty
+
+
+@pytest.mark.filterwarnings("error")
+def test_gene_rows(tmp_path: Path) -> None:
+    """It finds every row of each gene, wherever it is in the table."""
+    path = str(tmp_path / "tissue.pkl")
+    data = pd.read_csv(StringIO(GTEX_RESPONSE), sep="\t")
+    other = data.assign(gencodeId="ENSG00000000001.1", transcriptId="ENST1")
+    shuffled = pd.concat([data, other]).sample(frac=1, random_state=0)
+    shuffled.to_csv(tmp_path / "export.tsv", sep="\t", index=False)
+    prefetch_offline("Brain_Hypothalamus", tmp_path / "export.tsv", path)
+    rows = lookup(path, "Brain_Hypothalamus", "ENSG00000144355")
+    expected = data["transcriptId"].str.split(".").str[0]
+    assert sorted(rows["transcriptId"]) == sorted(expected)
+    assert set(
+        lookup(path, "Brain_Hypothalamus", "ENSG00000000001")["transcriptId"]
+    ) == {"ENST1"}
+
+
+def test_wrong_region(table: str) -> None:
+    """It refuses a table built for a different region."""
+    with pytest.raises(ValueError, match="Liver"):
+        lookup(table, "Liver", "ENSG00000144355.14")
+
+
+def test_checks_region(tmp_path: Path) -> None:
+    """It refuses to store rows for another region under this label."""
+    with pytest.raises(
+        ValueError, match="Brain_Hypothalamus"
+    ), requests_mock.Mocker() as m:
+        m.get(URL, text=GTEX_RESPONSE)
+        prefetch_tissue("Liver", ["ENSG00000144355.14"], tmp_path / "Liver.pkl")
+    assert not (tmp_path / "Liver.pkl").exists()
+
+
+def test_tissues_in_turn(tmp_path: Path) -> None:
+    """Each tissue prefetched in one process is queried for itself."""
+    with requests_mock.Mocker() as m:
+        m.get(URL, text=GTEX_RESPONSE)
+        for region in ("Brain_Hypothalamus", "Liver"):
+            with pytest.raises(ValueError) if region == "Liver" else nullcontext():
+                prefetch_tissue(region, ["ENSG1"], tmp_path / f"{region}.pkl")
+    assert [r.qs["tissuesitedetailid"] for r in m.request_history] == [
+        ["brain_hypothalamus"],
+        ["liver"],
+    ]
+
+
+def test_no_genes(tmp_path: Path) -> None:
+    """It stores an empty table when there is nothing to fetch."""
+    path = str(tmp_path / "tissue.pkl")
+    with requests_mock.Mocker() as m:
+        prefetch_tissue("Liver", ["phony"], path)
+    assert not m.called
+    assert lookup(path, "Liver", "ENSG00000144355").empty
+
+
+def test_offline(tmp_path: Path) -> None:
+    """It builds a table from a local export."""
+    path = str(tmp_path / "tissue.pkl")
+    prefetch_offline("Brain_Hypothalamus", CustomTempFile(GTEX_RESPONSE).filename, path)
+    assert len(lookup(path, "Brain_Hypothalamus", "ENSG00000144355")) == 7
@@ -12,7 +12,10 @@ Attributes
 ----------
 MANE : pd.DataFrame
     A minimal MANE dataset
+FULL_MANE : pd.DataFrame
+    ``MANE`` among as many other genes as the full MANE release
 """
+import time
 from io import StringIO
 from pathlib import Path
 
@@ -28,6 +31,46 @@ from ..custom_tmp_file import (
 )
 
 MANE: pd.DataFrame = pd.read_csv(StringIO(MANE_CONTENTS))
+FULL_MANE: pd.DataFrame = pd.concat(
+    [
+        pd.DataFrame(
+            {
+                "gencodeId": [f"ENSG{i:011d}.1" for i in range(19_000)],
+                "geneSymbol": [f"GENE{i}" for i in range(19_000)],
+                "refseq": [f"NM_{i}" for i in range(19_000)],
+                "transcriptId": [f"ENST{i:011d}.1" for i in range(19_000)],
+                "MANE_status": "MANE Select",
+            }
+        ),
+        MANE,
+    ],
+    ignore_index=True,
+)
+
+
+def _time_merge(mane: pd.DataFrame, out_path: Path) -> float:
+    """Time the fastest of a few merges.
+
+    Parameters
+    ----------
+    mane : pd.DataFrame
+        The MANE annotations to merge against.
+    out_path : Path
+        Where to write the merge.
+
+    Returns
+    -------
+    float
+        Seconds taken by the fastest merge.
+    """
+    gtex_path = CustomTempFile(GTEX_CONTENTS).filename
+    bm_path = CustomTempFile(BIOMART_CONTENTS).filename
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        merge_data(gtex_path, bm_path, mane, out_path)
+        times.append(time.perf_counter() - start)
+    return min(times)
 
 
 def test_writes_file(tmp_path: Path) -> None:
@@ -103,3 +146,37 @@ def test_sorted_results(tmp_path: Path) -> None:
     )
     results = pd.read_csv(out_path, index_col=None)
     assert results["median"].is_monotonic
+
+
+def test_leaves_mane_unchanged(tmp_path: Path) -> None:
+    """It does not modify the MANE table it is given."""
+    mane = MANE.copy()
+    merge_data(
+        CustomTempFile(GTEX_CONTENTS).filename,
+        CustomTempFile(BIOMART_CONTENTS).filename,
+        mane,
+        tmp_path / "out.csv",
+    )
+    pd.testing.assert_frame_equal(mane, MANE)
+
+
+def test_merges_with_full_mane(tmp_path: Path) -> None:
+    """It finds the gene's MANE transcript among every other gene's."""
+    out_path = tmp_path / "out.csv"
+    merge_data(
+        CustomTempFile(GTEX_CONTENTS).filename,
+        CustomTempFile(BIOMART_CONTENTS).filename,
+        FULL_MANE,
+        out_path,
+    )
+    results = pd.read_csv(out_path, index_col=None)
+    assert results.loc[results["MANE_status"].notna(), "transcriptId"].tolist() == [
+        "ENST00000361725"
+    ]
+
+
+def test_merge_time_ignores_other_genes(tmp_path: Path) -> None:
+    """Merging against the full MANE table costs about as much as one gene."""
+    one_gene = _time_merge(MANE, tmp_path / "one.csv")
+    full = _time_merge(FULL_MANE, tmp_path / "full.csv")
+    assert full < 2 * one_gene, f"{full * 1000:.0f} ms against {one_gene * 1000:.0f} ms"
@@ -5,6 +5,8 @@ These unit tests are designed to test that genes are passed to the query correct
 They do not test the API,
 as tests of data returned by realworld API queries are best left to integrations tests.
 """
+import subprocess  # noqa: S404
+import sys
 from io import StringIO
 from pathlib import Path
 
@@ -65,3 +67,14 @@ def test_writes_file(tmp_path: Path) -> None:
     response = pd.read_csv(output)
     expected = pd.read_csv(StringIO(GTEX_CONTENTS))
     assert_frame_equal(response, expected)
+
+
+def test_lazy_imports() -> None:
+    """It does not import pandas or requests on import."""
+    code = (
+        "import sys;"
+        "import gtexquery.data_handling.request;"
+        "assert 'pandas' not in sys.modules;"
+        "assert 'requests' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)  # noqa: S603
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Tests for the data_handling.summary submodule.
+
+Attributes
+----------
+MERGED : dict[str, str]
+    Minimal ``merge_data`` outputs, keyed by file name.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gtexquery.data_handling.process import merge_data
+from gtexquery.data_handling.summary import summarise, write_summary
+
+from ..custom_tmp_file import (
+    BIOMART_CONTENTS,
+    GTEX_CONTENTS,
+    MANE_CONTENTS,
+    CustomTempFile,
+)
+
+HEADER = "geneSymbol,transcriptId,tissueSiteDetailId,median,refseq,MANE_status\n"
+MERGED: dict[str, str] = {
+    "A_Liver.csv": HEADER
+    + "A,T1,Liver,1.0,NM_1,\n"
+    + "A,T2,Liver,5.0,NM_2,MANE Select\n"
+    + "A,T3,,,NM_3,\n",
+    "A_Lung.csv": HEADER + "A,T1,Lung,9.0,NM_1,\nA,T2,Lung,3.0,NM_2,MANE Select\n",
+    "B_Liver.csv": HEADER
+    + "B,T4,Liver,2.0,,\nB,T5,Liver,0.5,NM_5,MANE Plus Clinical\n",
+    "C_Lung.csv": HEADER + "C,T6,Lung,7.0,,\n",
+}
+
+
+@pytest.fixture
+def merged(tmp_path: Path) -> list[Path]:
+    """Write the ``merge_data`` outputs.
+
+    Parameters
+    ----------
+    tmp_path : Path
+        pytest fixture for temporary path
+
+    Returns
+    -------
+    list[Path]
+        The files written.
+    """
+    paths = []
+    for name, contents in MERGED.items():
+        path = tmp_path / name
+        path.write_text(contents)
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 10])
+def test_matrix(merged: list[Path], batch_size: int) -> None:
+    """It pivots every gene and tissue, whatever the batching."""
+    matrix, _ = summarise(merged, batch_size)
+    assert matrix.columns.tolist() == ["Liver", "Lung"]
+    assert matrix.index.names == ["geneSymbol", "transcriptId"]
+    assert matrix.index.get_level_values("transcriptId").tolist() == [
+        "T1",
+        "T2",
+        "T4",
+        "T5",
+        "T6",
+    ]
+    assert matrix.loc[("A", "T1")].tolist() == [1.0, 9.0]
+    assert np.isnan(matrix.loc[("C", "T6"), "Liver"])
+
+
+def test_genes(merged: list[Path]) -> None:
+    """It picks the top transcript by median across tissues and the MANE one."""
+    _, genes = summarise(merged, 2)
+    assert genes["top_transcript"].tolist() == ["T1", "T4", "T6"]
+    assert genes.loc["A", "top_median"] == 5.0
+    assert genes["mane_transcript"].fillna("").tolist() == ["T2", "T5", ""]
+    assert genes.loc["B", "MANE_status"] == "MANE Plus Clinical"
+
+
+def test_no_files() -> None:
+    """It returns empty summaries with their usual layout."""
+    matrix, genes = summarise([])
+    assert matrix.empty
+    assert matrix.index.names == ["geneSymbol", "transcriptId"]
+    assert genes.empty
+    assert genes.index.name == "geneSymbol"
+    assert genes.columns.tolist() == [
+        "top_transcript",
+        "top_median",
+        "mane_transcript",
+        "MANE_status",
+    ]
+
+
+def test_summarises_merge_data(tmp_path: Path) -> None:
+    """It reads the output of ``merge_data``."""
+    out_path = tmp_path / "out.csv"
+    merge_data(
+        CustomTempFile(GTEX_CONTENTS).filename,
+        CustomTempFile(BIOMART_CONTENTS).filename,
+        pd.read_csv(CustomTempFile(MANE_CONTENTS).filename),
+        out_path,
+    )
+    matrix, genes = summarise([out_path])
+    assert len(genes) == 1
+    assert genes["top_transcript"].iloc[0] in matrix.index.get_level_values(1)
+
+
+def test_writes_files(merged: list[Path], tmp_path: Path) -> None:
+    """It writes both tables."""
+    matrix_path = tmp_path / "matrix.csv"
+    genes_path = tmp_path / "genes.csv"
+    write_summary(merged, matrix_path, genes_path)
+    assert pd.read_csv(matrix_path).shape == (5, 4)
+    assert pd.read_csv(genes_path, index_col=0).index.tolist() == ["A", "B", "C"]
+
+
+def test_mixed_headers(merged: list[Path], tmp_path: Path) -> None:
+    """It reads files whose columns differ in order or lack a final newline."""
+    other = tmp_path / "D_Liver.csv"
+    other.write_text(
+        "transcriptId,geneSymbol,median,tissueSiteDetailId,MANE_status\nT7,D,4.0,Liver,"
+    )
+    matrix, genes = summarise([*merged, other])
+    assert matrix.loc[("D", "T7"), "Liver"] == 4.0
+    assert genes.loc["D", "top_transcript"] == "T7"
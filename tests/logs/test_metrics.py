@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Tests for gtexquery.logs.metrics."""
+from concurrent.futures import ThreadPoolExecutor
+
+from gtexquery.logs import metrics
+
+
+def test_increments() -> None:
+    """It adds to a counter."""
+    metrics.reset()
+    metrics.increment("phony", 2)
+    metrics.increment("phony")
+    assert metrics.snapshot() == {"phony": 3}
+
+
+def test_thread_safe() -> None:
+    """It counts every increment from many threads."""
+    metrics.reset()
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: metrics.increment("phony"), range(1000)))
+    assert metrics.snapshot()["phony"] == 1000
+
+
+def test_snapshot_is_copy() -> None:
+    """Its snapshots do not change with later increments."""
+    metrics.reset()
+    counters = metrics.snapshot()
+    metrics.increment("phony")
+    assert counters == {}
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Tests for gtexquery.logs.profiling."""
+import pstats
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from pytest import MonkeyPatch
+
+from gtexquery.logs.profiling import profiled
+
+
+@profiled("test")
+def _step(n: int) -> list[int]:
+    """Allocate a little and return it."""
+    return [i * 2 for i in range(n)]
+
+
+def test_disabled(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    """It writes nothing unless asked to."""
+    monkeypatch.delenv("GTEXQUERY_PROFILE", raising=False)
+    monkeypatch.setenv("GTEXQUERY_PROFILE_DIR", str(tmp_path))
+    assert _step(3) == [0, 2, 4]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cprofile(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    """It writes a loadable profile and a summary."""
+    monkeypatch.setenv("GTEXQUERY_PROFILE", "cprofile")
+    monkeypatch.setenv("GTEXQUERY_PROFILE_DIR", str(tmp_path))
+    assert _step(3) == [0, 2, 4]
+    (profile,) = tmp_path.glob("test-*.prof")
+    assert pstats.Stats(str(profile)).stats  # type: ignore
+    assert "_step" in (tmp_path / "summary.txt").read_text()
+
+
+def test_tracemalloc(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    """It summarises the largest allocations."""
+    monkeypatch.setenv("GTEXQUERY_PROFILE", "tracemalloc")
+    monkeypatch.setenv("GTEXQUERY_PROFILE_DIR", str(tmp_path))
+    _step(10000)
+    assert list(tmp_path.glob("*.prof")) == []
+    assert "test_profiling.py" in (tmp_path / "summary.txt").read_text()
+
+
+def test_unknown_profiler(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    """It rejects profilers it does not know."""
+    monkeypatch.setenv("GTEXQUERY_PROFILE", "perf")
+    monkeypatch.setenv("GTEXQUERY_PROFILE_DIR", str(tmp_path))
+    with pytest.raises(ValueError):
+        _step(1)
+
+
+def test_serialises_calls(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    """Concurrent steps are profiled one at a time."""
+    monkeypatch.setenv("GTEXQUERY_PROFILE", "cprofile,tracemalloc")
+    monkeypatch.setenv("GTEXQUERY_PROFILE_DIR", str(tmp_path))
+    running = []
+    overlap = []
+    lock = threading.Lock()
+
+    @profiled("concurrent")
+    def step(i: int) -> int:
+        with lock:
+            running.append(i)
+            overlap.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(i)
+        return i
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(step, range(8))) == list(range(8))
+    assert max(overlap) == 1
+    assert len(list(tmp_path.glob("concurrent-*.prof"))) == 8
+
+
+def test_nested_calls(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    """A step called from a profiled step is covered by the outer profile."""
+    monkeypatch.setenv("GTEXQUERY_PROFILE", "cprofile")
+    monkeypatch.setenv("GTEXQUERY_PROFILE_DIR", str(tmp_path))
+
+    @profiled("outer")
+    def outer() -> list[int]:
+        return _step(2)
+
+    assert outer() == [0, 2]
+    assert [p.name.split("-")[0] for p in tmp_path.glob("*.prof")] == ["outer"]
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Tests for gtexquery.logs.progress."""
+import json
+import logging
+import threading
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import requests_mock
+
+from gtexquery.data_handling.request import gtex_request
+from gtexquery.logs import metrics
+from gtexquery.logs.progress import ProgressReporter
+from gtexquery.multithreading.batch import run_batch
+from gtexquery.multithreading.hybrid import merge_many
+from gtexquery.multithreading.shard import LeaseDir, run_leased
+
+from ..custom_tmp_file import (
+    BIOMART_CONTENTS,
+    GTEX_CONTENTS,
+    GTEX_RESPONSE,
+    MANE_CONTENTS,
+    CustomTempFile,
+)
+
+URL = "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression"
+
+
+def test_counts_updates() -> None:
+    """It counts finished units."""
+    progress = ProgressReporter(10, interval=3600)
+    progress.update()
+    progress.update(2)
+    assert progress.completed == 3
+
+
+def test_reports_figures() -> None:
+    """It reports completion, rates, cache hits and ETA."""
+    metrics.reset()
+    progress = ProgressReporter(10, interval=3600)
+    metrics.increment("requests:gtexportal.org", 4)
+    metrics.increment("cache_hits")
+    progress.update(5)
+    status = progress.emit()
+    assert status["completed"] == 5
+    assert status["requests_per_second"]["gtexportal.org"] > 0
+    assert status["cache_hit_rate"] == 0.25
+    assert status["eta"] is not None
+
+
+def test_reports_bytes(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """It reports the bytes transferred and saved, to the log and status file."""
+    metrics.reset()
+    metrics.increment("bytes_transferred", 1_000_000)
+    metrics.increment("bytes_saved", 3_000_000)
+    status_file = tmp_path / "status.json"
+    with caplog.at_level(logging.INFO):
+        with ProgressReporter(1, interval=3600, status_file=str(status_file)):
+            pass
+    status = json.loads(status_file.read_text())
+    assert status["bytes_transferred"] == 1_000_000
+    assert status["bytes_saved"] == 3_000_000
+    assert "1.0 MB transferred, 3.0 MB saved" in caplog.text
+
+
+def test_writes_status_file(tmp_path: Path) -> None:
+    """It writes the status file at each report."""
+    status_file = tmp_path / "status.json"
+    with ProgressReporter(2, interval=0, status_file=str(status_file)) as progress:
+        progress.update()
+        assert json.loads(status_file.read_text())["completed"] == 1
+    assert json.loads(status_file.read_text())["completed"] == 1
+
+
+def test_hooks_into_batch(tmp_path: Path) -> None:
+    """It is updated by the batch runner and counts requests per host."""
+    metrics.reset()
+    jobs = [
+        ("Brain_Hypothalamus", "ENSG00000144355.14", str(tmp_path / "a.csv")),
+        ("Brain_Hypothalamus", "phony", str(tmp_path / "b.csv")),
+    ]
+    progress = ProgressReporter(len(jobs), interval=3600)
+    with requests_mock.Mocker() as m:
+        m.get(URL, text=GTEX_RESPONSE)
+        run_batch(gtex_request, jobs, threads=1, progress=progress)
+    assert progress.completed == 2
+    assert metrics.snapshot()["requests:gtexportal.org"] == 1
+
+
+def test_counts_leased_units_once(tmp_path: Path) -> None:
+    """Units waited on over several passes are counted once."""
+    jobs = [(str(i),) for i in range(4)]
+    other = LeaseDir(tmp_path)
+    assert other.acquire(jobs[0])
+    threading.Timer(0.35, other.complete, args=(jobs[0],)).start()
+    progress = ProgressReporter(len(jobs), interval=3600)
+    run_leased(lambda *args: None, jobs, tmp_path, poll=0.1, progress=progress)
+    assert progress.completed == len(jobs)
+
+
+def test_hooks_into_hybrid(tmp_path: Path) -> None:
+    """It is updated by the hybrid executors."""
+    gtex = CustomTempFile(GTEX_CONTENTS).filename
+    bm = CustomTempFile(BIOMART_CONTENTS).filename
+    jobs = [(gtex, bm, str(tmp_path / f"{i}.csv")) for i in range(2)]
+    progress = ProgressReporter(len(jobs), interval=3600)
+    merge_many(jobs, pd.read_csv(StringIO(MANE_CONTENTS)), 1, progress)
+    assert progress.completed == len(jobs)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.batch submodule."""
+import json
+from pathlib import Path
+
+import requests_mock
+
+from gtexquery.data_handling.request import gtex_request
+from gtexquery.multithreading.batch import run_batch
+
+from ..custom_tmp_file import GTEX_RESPONSE
+
+URL = "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression"
+
+
+def test_completes(tmp_path: Path) -> None:
+    """It completes every job when nothing fails."""
+    jobs = [("Brain_Hypothalamus", "ENSG00000144355.14", str(tmp_path / "a.csv"))]
+    with requests_mock.Mocker() as m:
+        m.get(URL, text=GTEX_RESPONSE)
+        result = run_batch(gtex_request, jobs)
+    assert result.completed == jobs
+    assert not result.failed
+
+
+def test_skips(tmp_path: Path) -> None:
+    """It records genes that exit without output as skipped."""
+    jobs = [("Brain_Hypothalamus", "phony", str(tmp_path / "a.csv"))]
+    result = run_batch(gtex_request, jobs)
+    assert result.skipped == jobs
+
+
+def test_keeps_going(tmp_path: Path) -> None:
+    """It does not abort when a job fails."""
+    jobs = [
+        ("Brain_Hypothalamus", "ENSG0", str(tmp_path / "a.csv")),
+        ("Brain_Hypothalamus", "ENSG1", str(tmp_path / "b.csv")),
+    ]
+    with requests_mock.Mocker() as m:
+        m.get(URL + "?gencodeId=ENSG0", status_code=400)
+        m.get(URL + "?gencodeId=ENSG1", text=GTEX_RESPONSE)
+        result = run_batch(gtex_request, jobs, backoff=0)
+    assert result.completed == [jobs[1]]
+    assert len(result.failed) == 1
+    failure = result.failed[0]
+    assert failure.status == 400
+    assert not failure.retryable
+    assert failure.attempts == 1, "A permanent failure was retried."
+
+
+def test_retries(tmp_path: Path) -> None:
+    """It retries transient failures."""
+    jobs = [("Brain_Hypothalamus", "ENSG0", str(tmp_path / "a.csv"))]
+    with requests_mock.Mocker() as m:
+        m.get(URL, [{"status_code": 503}, {"text": GTEX_RESPONSE}])
+        result = run_batch(gtex_request, jobs, backoff=0)
+    assert result.completed == jobs
+    assert not result.failed
+
+
+def test_writes_report(tmp_path: Path) -> None:
+    """It writes the remaining failures to a report."""
+    jobs = [("Brain_Hypothalamus", "ENSG0", str(tmp_path / "a.csv"))]
+    report = tmp_path / "report.json"
+    with requests_mock.Mocker() as m:
+        m.get(URL, status_code=429)
+        run_batch(gtex_request, jobs, retries=2, backoff=0, report=str(report))
+    contents = json.loads(report.read_text())
+    assert contents["completed"] == 0
+    assert contents["failed"][0]["args"] == list(jobs[0])
+    assert contents["failed"][0]["error"] == "HTTPError"
+    assert contents["failed"][0]["attempts"] == 3
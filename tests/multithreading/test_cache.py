@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.cache submodule.
+
+As with the replay tests,
+a ``requests_mock.Adapter`` stands in for the network as the inner adapter.
+"""
+import gzip
+import os
+import time
+from pathlib import Path
+
+import pytest
+import requests_mock
+
+from gtexquery.logs import metrics
+from gtexquery.multithreading.cache import CachingAdapter
+from gtexquery.multithreading.replay import Cassette, fingerprint
+from gtexquery.multithreading.request import _get_session, thread_local
+
+from ..custom_tmp_file import GTEX_RESPONSE, adapter_session
+
+URL = "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression"
+
+
+def _expire(cassette: Cassette) -> None:
+    """Age the stored response past any TTL.
+
+    Parameters
+    ----------
+    cassette : Cassette
+        The store holding the response for ``URL``.
+    """
+    old = time.time() - 3600
+    os.utime(cassette._file(fingerprint("GET", URL)), (old, old))
+
+
+def test_serves_fresh(tmp_path: Path) -> None:
+    """It serves fresh responses without the network."""
+    metrics.reset()
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, text=GTEX_RESPONSE)
+    session = adapter_session(CachingAdapter(Cassette(tmp_path), 60, network))
+    session.get(URL)
+    response = session.get(URL)
+    assert network.call_count == 1
+    assert response.from_cache  # type: ignore
+    assert response.text == GTEX_RESPONSE
+    assert metrics.snapshot()["bytes_saved"] == len(GTEX_RESPONSE)
+
+
+def test_revalidates(tmp_path: Path) -> None:
+    """It revalidates expired responses and reuses them on a 304."""
+    metrics.reset()
+    cassette = Cassette(tmp_path)
+    network = requests_mock.Adapter()
+    network.register_uri(
+        "GET",
+        URL,
+        [
+            {"text": GTEX_RESPONSE, "headers": {"ETag": '"v1"'}},
+            {"status_code": 304},
+        ],
+    )
+    session = adapter_session(CachingAdapter(cassette, 60, network))
+    session.get(URL)
+    _expire(cassette)
+    response = session.get(URL)
+    assert network.request_history[-1].headers["If-None-Match"] == '"v1"'
+    assert response.status_code == 200
+    assert response.text == GTEX_RESPONSE
+    assert metrics.snapshot()["cache_revalidated"] == 1
+    age = cassette.age(fingerprint("GET", URL))
+    assert age is not None and age < 60, "It was not refreshed."
+
+
+def test_replaces_modified(tmp_path: Path) -> None:
+    """It stores the new body when the resource has changed."""
+    cassette = Cassette(tmp_path)
+    network = requests_mock.Adapter()
+    network.register_uri(
+        "GET",
+        URL,
+        [
+            {"text": "old", "headers": {"Last-Modified": "Mon, 01 Jan 2024"}},
+            {"text": "new"},
+        ],
+    )
+    session = adapter_session(CachingAdapter(cassette, 60, network))
+    session.get(URL)
+    _expire(cassette)
+    assert session.get(URL).text == "new"
+    assert (
+        network.request_history[-1].headers["If-Modified-Since"] == "Mon, 01 Jan 2024"
+    )
+    assert session.get(URL).text == "new"
+    assert network.call_count == 2
+
+
+def test_skips_errors(tmp_path: Path) -> None:
+    """It does not cache error responses."""
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, status_code=500)
+    session = adapter_session(CachingAdapter(Cassette(tmp_path), 60, network))
+    session.get(URL)
+    session.get(URL)
+    assert network.call_count == 2
+
+
+def test_records_compression(tmp_path: Path) -> None:
+    """It records bytes on the wire and once decoded."""
+    metrics.reset()
+    body = gzip.compress(GTEX_RESPONSE.encode())
+    network = requests_mock.Adapter()
+    network.register_uri(
+        "GET",
+        URL,
+        content=body,
+        headers={"Content-Encoding": "gzip", "Content-Length": str(len(body))},
+    )
+    adapter_session(CachingAdapter(Cassette(tmp_path), 60, network)).get(URL)
+    counters = metrics.snapshot()
+    assert counters["bytes_transferred"] == len(body)
+    assert counters["bytes_decoded"] == len(GTEX_RESPONSE)
+
+
+def test_records_chunked_compression(tmp_path: Path) -> None:
+    """It counts compressed bytes on the wire without a Content-Length."""
+    metrics.reset()
+    body = gzip.compress(GTEX_RESPONSE.encode())
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, content=body, headers={"Content-Encoding": "gzip"})
+    response = adapter_session(CachingAdapter(Cassette(tmp_path), 60, network)).get(URL)
+    assert response.text == GTEX_RESPONSE
+    counters = metrics.snapshot()
+    assert counters["bytes_transferred"] == len(body)
+    assert counters["bytes_decoded"] == len(GTEX_RESPONSE)
+
+
+def test_mounts_from_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sessions mount the adapter when the environment asks for it."""
+    monkeypatch.setenv("GTEXQUERY_CACHE_DIR", str(tmp_path))
+    if hasattr(thread_local, "session"):
+        del thread_local.session
+    adapter = _get_session().get_adapter(URL)
+    del thread_local.session
+    assert isinstance(adapter, CachingAdapter)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.daemon submodule.
+
+Each test starts a daemon on a temporary socket,
+serving from a background thread,
+and talks to it through the ``submit`` client.
+"""
+import os
+import socket
+import stat
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import requests_mock
+
+from gtexquery.multithreading.daemon import Daemon, DaemonError, submit
+
+from ..custom_tmp_file import (
+    BIOMART_CONTENTS,
+    GTEX_CONTENTS,
+    GTEX_RESPONSE,
+    MANE_CONTENTS,
+    CustomTempFile,
+)
+
+lut = pd.DataFrame.from_dict({"name": ["DLX1"], "id": ["ENSG00000144355.14"]})
+
+
+@contextmanager
+def _serve(path: str, workers: int = 8) -> Iterator[str]:
+    """Serve a daemon from a background thread.
+
+    Parameters
+    ----------
+    path : str
+        Where to create the socket.
+    workers : int
+        The number of worker threads.
+
+    Yields
+    ------
+    str
+        The path to the socket.
+    """
+    daemon = Daemon(
+        path, lut=lut, mane=pd.read_csv(StringIO(MANE_CONTENTS)), workers=workers
+    )
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        yield path
+    finally:
+        daemon.shutdown()
+        thread.join()
+        daemon.server_close()
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> Iterator[str]:
+    """Serve a daemon on a temporary socket.
+
+    Parameters
+    ----------
+    tmp_path : Path
+        pytest fixture for temporary path
+
+    Yields
+    ------
+    str
+        The path to the socket.
+    """
+    with _serve(str(tmp_path / "daemon.sock")) as path:
+        yield path
+
+
+def test_socket_private(socket_path: str) -> None:
+    """Only the owner can connect to the socket."""
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+
+def test_keeps_other_files(tmp_path: Path) -> None:
+    """It does not delete a file that is not a socket."""
+    path = tmp_path / "lut.csv"
+    path.write_text("name,id\n")
+    with pytest.raises(OSError):
+        Daemon(str(path))
+    assert path.read_text() == "name,id\n"
+
+
+def test_refuses_live_socket(socket_path: str) -> None:
+    """It does not take over the socket of a running daemon."""
+    with pytest.raises(OSError, match="already listening"):
+        Daemon(socket_path)
+    assert submit(socket_path, "ping") == "pong"
+
+
+def test_replaces_stale_socket(tmp_path: Path) -> None:
+    """It replaces a socket nothing listens on."""
+    path = str(tmp_path / "daemon.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+    with _serve(path):
+        assert submit(path, "ping") == "pong"
+    assert not os.path.exists(path)
+
+
+def test_keeps_new_socket(tmp_path: Path) -> None:
+    """Closing leaves a socket created since at the same path."""
+    path = str(tmp_path / "daemon.sock")
+    daemon = Daemon(path)
+    os.unlink(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+        daemon.server_close()
+        assert os.path.exists(path)
+
+
+def test_ping(socket_path: str) -> None:
+    """It answers a ping."""
+    assert submit(socket_path, "ping") == "pong"
+
+
+def test_lut(socket_path: str) -> None:
+    """It converts gene names with the warm LUT."""
+    assert submit(socket_path, "lut", gene="DLX1") == "ENSG00000144355.14"
+    assert submit(socket_path, "lut", gene="phony") == "phony"
+
+
+def test_request(socket_path: str, tmp_path: Path) -> None:
+    """It runs the request step."""
+    output = tmp_path / "DLX1.csv"
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression",
+            text=GTEX_RESPONSE,
+        )
+        result = submit(
+            socket_path,
+            "request",
+            region="Brain_Hypothalamus",
+            gene="ENSG00000144355.14",
+            output=str(output),
+        )
+    assert result is True
+    assert output.is_file(), "The file was not created."
+
+
+def test_request_regions(tmp_path: Path) -> None:
+    """A reused worker queries the region of each job, not its first."""
+    with _serve(str(tmp_path / "daemon.sock"), workers=1) as path:
+        with requests_mock.Mocker() as m:
+            m.get(
+                "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression",
+                text=GTEX_RESPONSE,
+            )
+            for region in ("Brain_Hypothalamus", "Liver"):
+                submit(
+                    path,
+                    "request",
+                    region=region,
+                    gene="ENSG00000144355.14",
+                    output=str(tmp_path / f"{region}.csv"),
+                )
+    # requests_mock lowercases the query string
+    assert [r.qs["tissuesitedetailid"] for r in m.request_history] == [
+        ["brain_hypothalamus"],
+        ["liver"],
+    ]
+    assert all(r.qs["format"] == ["tsv"] for r in m.request_history)
+
+
+def test_request_skips(socket_path: str, tmp_path: Path) -> None:
+    """It reports skipped genes rather than exiting."""
+    output = tmp_path / "phony.csv"
+    result = submit(
+        socket_path, "request", region="phony", gene="phony", output=str(output)
+    )
+    assert result is False
+    assert not output.is_file(), "The file was created."
+
+
+def test_merge(socket_path: str, tmp_path: Path) -> None:
+    """It runs the process step against the warm MANE table."""
+    output = tmp_path / "out.csv"
+    submit(
+        socket_path,
+        "merge",
+        gtex_path=CustomTempFile(GTEX_CONTENTS).filename,
+        bm_path=CustomTempFile(BIOMART_CONTENTS).filename,
+        out_path=str(output),
+    )
+    results = pd.read_csv(output)
+    assert (results["MANE_status"] == "MANE Select").sum() == 1
+
+
+def test_raises_remote_error(socket_path: str, tmp_path: Path) -> None:
+    """It raises errors from the daemon in the client."""
+    with pytest.raises(DaemonError, match="HTTPError"), requests_mock.Mocker() as m:
+        m.get(
+            "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression",
+            status_code=400,
+        )
+        submit(
+            socket_path,
+            "request",
+            region="Brain_Hypothalamus",
+            gene="ENSG00000144355.14",
+            output=str(tmp_path / "DLX1.csv"),
+        )
+
+
+def test_unknown_operation(socket_path: str) -> None:
+    """It rejects unknown operations."""
+    with pytest.raises(DaemonError, match="ValueError"):
+        submit(socket_path, "phony")
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.http2 submodule.
+
+An ``httpx.MockTransport`` stands in for the network behind the client.
+"""
+import asyncio
+import gzip
+from pathlib import Path
+from typing import Callable
+
+import pytest
+import requests
+
+pytest.importorskip("httpx")
+import httpx  # noqa: E402
+
+from gtexquery.multithreading import http2
+from gtexquery.multithreading.cache import CachingAdapter
+from gtexquery.multithreading.http2 import HTTP2Adapter
+from gtexquery.multithreading.request import _get_session, thread_local
+
+from ..custom_tmp_file import GTEX_RESPONSE
+
+URL = "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression"
+
+
+def _session(handler: Callable[[httpx.Request], httpx.Response]) -> requests.Session:
+    """Create a session sending all traffic through a mocked client.
+
+    Parameters
+    ----------
+    handler : Callable[[httpx.Request], httpx.Response]
+        Answers each ``httpx.Request``.
+
+    Returns
+    -------
+    requests.Session
+    """
+    session = requests.Session()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    session.mount("https://", HTTP2Adapter(client))
+    return session
+
+
+def test_converts_response() -> None:
+    """It returns the reply as a ``requests.Response``."""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, text=GTEX_RESPONSE)
+
+    response = _session(handler).get(URL, params={"gencodeId": "ENSG1"})
+    assert response.status_code == 200
+    assert response.text == GTEX_RESPONSE
+    assert response.url == f"{URL}?gencodeId=ENSG1"
+    assert seen[0].url.params["gencodeId"] == "ENSG1"
+
+
+def test_decodes_gzip() -> None:
+    """It hands back the decoded body."""
+    body = gzip.compress(GTEX_RESPONSE.encode())
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body, headers={"Content-Encoding": "gzip"})
+
+    assert _session(handler).get(URL).text == GTEX_RESPONSE
+
+
+def test_raises_http_errors() -> None:
+    """Error statuses raise as they would over HTTP/1.1."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    with pytest.raises(requests.HTTPError):
+        _session(handler).get(URL).raise_for_status()
+
+
+@pytest.mark.parametrize(
+    ("error", "expected"),
+    [
+        (httpx.ConnectTimeout, requests.Timeout),
+        (httpx.ConnectError, requests.ConnectionError),
+    ],
+)
+def test_translates_errors(error: type, expected: type) -> None:
+    """Transport errors become their ``requests`` equivalents."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise error("failed", request=request)
+
+    with pytest.raises(expected):
+        _session(handler).get(URL)
+
+
+def test_mounts_from_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sessions mount a shared adapter beneath the cache."""
+    monkeypatch.setenv("GTEXQUERY_HTTP_BACKEND", "http2")
+    monkeypatch.setenv("GTEXQUERY_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(http2, "_client", None)
+    if hasattr(thread_local, "session"):
+        del thread_local.session
+    try:
+        adapter = _get_session().get_adapter(URL)
+        del thread_local.session
+        assert isinstance(adapter, CachingAdapter)
+        assert isinstance(adapter.inner, HTTP2Adapter)
+        assert adapter.inner.client is http2.shared_client()
+    finally:
+        closing = http2.shared_client().aclose()
+        asyncio.run_coroutine_threadsafe(closing, http2._event_loop()).result()
+
+
+def test_unknown_backend(monkeypatch: pytest.MonkeyPatch) -> None:
+    """It rejects backends it does not know."""
+    monkeypatch.setenv("GTEXQUERY_HTTP_BACKEND", "http3")
+    with pytest.raises(ValueError):
+        http2.mount_from_env(requests.Session())
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.hybrid submodule.
+
+The fetches run on threads in the test process,
+so ``requests_mock`` intercepts them as usual.
+The parses run in worker processes,
+which only need the files on disk.
+"""
+import logging
+import multiprocessing
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import requests_mock
+from pandas.testing import assert_frame_equal
+
+from gtexquery.data_handling.prefetch import prefetch_offline
+from gtexquery.multithreading.hybrid import (
+    _mp_context,
+    biomart_requests,
+    gtex_requests,
+    hybrid_map,
+    merge_many,
+)
+
+from ..custom_tmp_file import (
+    BIOMART_CONTENTS,
+    BIOMART_RESPONSE,
+    GTEX_CONTENTS,
+    GTEX_RESPONSE,
+    MANE_CONTENTS,
+    CustomTempFile,
+)
+
+
+def test_preserves_order() -> None:
+    """It returns the parse results in the order of the jobs."""
+    jobs = [((f"{i}",), (i,)) for i in range(10)]
+    results = hybrid_map(str.upper, str.ljust, jobs, threads=4, processes=2)
+    assert results == [str(i).ljust(i) for i in range(10)]
+
+
+@pytest.mark.skipif(
+    "forkserver" not in multiprocessing.get_all_start_methods(),
+    reason="No fork server on this platform",
+)
+def test_forkserver() -> None:
+    """Workers are not forked from the threaded parent."""
+    assert _mp_context().get_start_method() == "forkserver"
+
+
+def test_gtex_requests(tmp_path: Path) -> None:
+    """It writes one file per gene and skips missing genes."""
+    outputs = [str(tmp_path / f"{i}.csv") for i in range(3)]
+    genes = ["ENSG00000144355.14", "phony", "ENSG00000144355.14"]
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression",
+            text=GTEX_RESPONSE,
+        )
+        written = gtex_requests(
+            zip(["Brain_Hypothalamus"] * 3, genes, outputs), processes=2
+        )
+    assert written == [outputs[0], outputs[2]]
+    assert not Path(outputs[1]).is_file(), "The skipped gene was written."
+    assert_frame_equal(pd.read_csv(outputs[0]), pd.read_csv(StringIO(GTEX_CONTENTS)))
+
+
+def test_gtex_requests_prefetched(tmp_path: Path) -> None:
+    """It answers genes from a prefetched table, as ``gtex_request`` does."""
+    table = str(tmp_path / "tissue.pkl")
+    prefetch_offline(
+        "Brain_Hypothalamus", CustomTempFile(GTEX_RESPONSE).filename, table
+    )
+    output = str(tmp_path / "out.csv")
+    with requests_mock.Mocker() as m:
+        gtex_requests(
+            [("Brain_Hypothalamus", "ENSG00000144355.14", output)],
+            processes=1,
+            prefetched=table,
+        )
+    assert not m.called, "The network was used."
+    assert_frame_equal(pd.read_csv(output), pd.read_csv(StringIO(GTEX_CONTENTS)))
+
+
+def test_biomart_requests(tmp_path: Path) -> None:
+    """It writes one file per input."""
+    output = str(tmp_path / "bm.csv")
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, text=BIOMART_RESPONSE)
+        biomart_requests([(CustomTempFile(GTEX_CONTENTS).filename, output)])
+    assert_frame_equal(pd.read_csv(output), pd.read_csv(StringIO(BIOMART_CONTENTS)))
+
+
+def test_biomart_requests_mapping(tmp_path: Path) -> None:
+    """It looks transcripts up in a local export, as ``biomart_request`` does."""
+    output = str(tmp_path / "bm.csv")
+    mapping = CustomTempFile(BIOMART_RESPONSE.lstrip()).filename
+    with requests_mock.Mocker() as m:
+        biomart_requests(
+            [(CustomTempFile(GTEX_CONTENTS).filename, output)], mapping=mapping
+        )
+    assert not m.called, "The network was used."
+    assert_frame_equal(pd.read_csv(output), pd.read_csv(StringIO(BIOMART_CONTENTS)))
+
+
+def test_merge_many(tmp_path: Path) -> None:
+    """It merges each gene against the shared MANE table."""
+    outputs = [str(tmp_path / f"{i}.csv") for i in range(2)]
+    gtex = CustomTempFile(GTEX_CONTENTS).filename
+    bm = CustomTempFile(BIOMART_CONTENTS).filename
+    mane = pd.read_csv(StringIO(MANE_CONTENTS))
+    written = merge_many([(gtex, bm, out) for out in outputs], mane, processes=2)
+    assert written == outputs
+    assert_frame_equal(mane, pd.read_csv(StringIO(MANE_CONTENTS)))
+    for out in outputs:
+        assert (pd.read_csv(out)["MANE_status"] == "MANE Select").sum() == 1
+
+
+def test_workers_log_to_parent(tmp_path: Path) -> None:
+    """Records logged in the workers are written by the parent's handlers."""
+    log = tmp_path / "run.log"
+    handler = logging.FileHandler(log)
+    root = logging.getLogger()
+    level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    gtex = CustomTempFile(GTEX_CONTENTS).filename
+    bm = CustomTempFile(BIOMART_CONTENTS).filename
+    try:
+        merge_many(
+            [(gtex, bm, str(tmp_path / "out.csv"))],
+            pd.read_csv(StringIO(MANE_CONTENTS)),
+            processes=1,
+        )
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+        handler.close()
+    contents = log.read_text()
+    assert "Processing data for gene DLX1" in contents
+    assert "Gene DLX1 processed!" in contents
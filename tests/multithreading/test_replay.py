@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.replay submodule.
+
+``requests_mock.Mocker`` replaces the adapters of every session,
+which would hide the adapter under test.
+Instead,
+a ``requests_mock.Adapter`` stands in for the network as the inner adapter.
+"""
+from pathlib import Path
+
+import pytest
+import requests
+import requests_mock
+
+from gtexquery.multithreading.replay import Cassette, ReplayAdapter
+from gtexquery.multithreading.request import _get_session, thread_local
+
+from ..custom_tmp_file import GTEX_RESPONSE, adapter_session
+
+URL = "https://gtexportal.org/rest/v1/expression/mediantranscriptexpression"
+
+
+def test_records_and_replays(tmp_path: Path) -> None:
+    """It replays a recorded response without the network."""
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, text=GTEX_RESPONSE)
+    cassette = Cassette(tmp_path)
+
+    recorded = adapter_session(ReplayAdapter(cassette, "record", network)).get(
+        URL, params={"gencodeId": "ENSG00000144355.14", "format": "tsv"}
+    )
+    replayed = adapter_session(ReplayAdapter(cassette, "replay", network)).get(
+        URL, params={"format": "tsv", "gencodeId": "ENSG00000144355.14"}
+    )
+    assert network.call_count == 1, "The replay used the network."
+    assert replayed.status_code == recorded.status_code
+    assert replayed.text == recorded.text
+
+
+def test_records_compressed(tmp_path: Path) -> None:
+    """It stores responses compressed."""
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, text=GTEX_RESPONSE * 10)
+    adapter_session(ReplayAdapter(Cassette(tmp_path), "record", network)).get(URL)
+    (stored,) = tmp_path.glob("*.gz")
+    assert stored.stat().st_size < len(GTEX_RESPONSE * 10)
+
+
+def test_replays_errors(tmp_path: Path) -> None:
+    """It replays error responses."""
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, status_code=400)
+    cassette = Cassette(tmp_path)
+    adapter_session(ReplayAdapter(cassette, "record", network)).get(URL)
+    response = adapter_session(ReplayAdapter(cassette, "replay")).get(URL)
+    with pytest.raises(requests.HTTPError):
+        response.raise_for_status()
+
+
+def test_missing_recording(tmp_path: Path) -> None:
+    """It raises a ConnectionError for a request that was never recorded."""
+    with pytest.raises(requests.ConnectionError, match="No recording"):
+        adapter_session(ReplayAdapter(Cassette(tmp_path), "replay")).get(URL)
+
+
+def test_passthrough(tmp_path: Path) -> None:
+    """It neither records nor replays in passthrough mode."""
+    network = requests_mock.Adapter()
+    network.register_uri("GET", URL, text=GTEX_RESPONSE)
+    adapter_session(ReplayAdapter(Cassette(tmp_path), "passthrough", network)).get(URL)
+    assert not list(tmp_path.glob("*.gz"))
+
+
+def test_invalid_mode(tmp_path: Path) -> None:
+    """It rejects unknown modes."""
+    with pytest.raises(ValueError, match="phony"):
+        ReplayAdapter(Cassette(tmp_path), "phony")
+
+
+def test_mounts_from_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sessions mount the adapter when the environment asks for it."""
+    monkeypatch.setenv("GTEXQUERY_REPLAY", "replay")
+    monkeypatch.setenv("GTEXQUERY_REPLAY_DIR", str(tmp_path))
+    if hasattr(thread_local, "session"):
+        del thread_local.session
+    adapter = _get_session().get_adapter(URL)
+    del thread_local.session
+    assert isinstance(adapter, ReplayAdapter)
+    assert adapter.mode == "replay"
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Tests for the multithreading.shard submodule."""
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from gtexquery.multithreading.shard import (
+    LeaseDir,
+    merge_reports,
+    run_leased,
+    select_shard,
+)
+
+jobs = [("Brain_Hypothalamus", f"ENSG{i}", f"{i}.csv") for i in range(20)]
+
+
+def test_shards_partition() -> None:
+    """Every unit belongs to exactly one shard."""
+    shards = [select_shard(jobs, i, 3) for i in range(3)]
+    assert sorted(sum(shards, [])) == sorted(jobs)
+
+
+def test_shards_deterministic() -> None:
+    """The assignment does not depend on order."""
+    assert select_shard(jobs, 1, 3) == select_shard(jobs[::-1], 1, 3)[::-1]
+
+
+def test_invalid_shard() -> None:
+    """It raises a ValueError for an invalid shard."""
+    with pytest.raises(ValueError, match="Shard 3"):
+        select_shard(jobs, 3, 3)
+
+
+def test_lease_exclusive(tmp_path: Path) -> None:
+    """Only one holder can acquire a lease."""
+    a, b = LeaseDir(tmp_path), LeaseDir(tmp_path)
+    assert a.acquire(jobs[0])
+    assert not b.acquire(jobs[0])
+    a.complete(jobs[0])
+    assert not b.acquire(jobs[0]), "A completed unit was acquired."
+
+
+def test_lease_expires(tmp_path: Path) -> None:
+    """An expired lease is reclaimed."""
+    a, b = LeaseDir(tmp_path, ttl=60), LeaseDir(tmp_path, ttl=60)
+    assert a.acquire(jobs[0])
+    old = time.time() - 120
+    os.utime(a._lease(jobs[0]), (old, old))
+    assert b.acquire(jobs[0])
+
+
+def test_lease_reclaim_race(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A node that loses the race to reclaim a lease backs off."""
+    a, b = LeaseDir(tmp_path, ttl=60), LeaseDir(tmp_path, ttl=60)
+    assert LeaseDir(tmp_path).acquire(jobs[0])
+    old = time.time() - 120
+    os.utime(a._lease(jobs[0]), (old, old))
+
+    def reclaimed_meanwhile(args: tuple) -> bool:
+        # b reclaims between a's check and a's rename
+        assert b.acquire(args)
+        return True
+
+    monkeypatch.setattr(a, "is_expired", reclaimed_meanwhile)
+    assert not a.acquire(jobs[0])
+    assert a._lease(jobs[0]).exists(), "The live lease was not restored."
+    assert len(list(tmp_path.glob("*.stale-*"))) == 1, "A lease was left aside."
+
+
+def test_runs_once(tmp_path: Path) -> None:
+    """Two nodes sharing a lease directory run each unit once."""
+    calls: list[tuple] = []
+    first = run_leased(lambda *args: calls.append(args), jobs, tmp_path)
+    second = run_leased(lambda *args: calls.append(args), jobs, tmp_path)
+    assert sorted(calls) == sorted(jobs)
+    assert first.completed == jobs
+    assert second == ([], [], []), "Units run by another node were reported."
+
+
+def test_reports_own_skips(tmp_path: Path) -> None:
+    """Units skipped by the function are reported as skipped."""
+
+    def skip(*args: str) -> None:
+        raise SystemExit
+
+    assert run_leased(skip, jobs, tmp_path).skipped == jobs
+
+
+def test_fails_once(tmp_path: Path) -> None:
+    """A unit that fails on one node is not run again by another."""
+    calls: list[tuple] = []
+
+    def fail(*args: str) -> None:
+        calls.append(args)
+        raise RuntimeError("phony")
+
+    first = run_leased(
+        fail, jobs[:1], tmp_path, retries=0, report=str(tmp_path / "0.json")
+    )
+    second = run_leased(
+        fail, jobs[:1], tmp_path, retries=0, report=str(tmp_path / "1.json")
+    )
+    assert calls == jobs[:1]
+    assert len(first.failed) == 1
+    assert second == ([], [], [])
+    assert not LeaseDir(tmp_path).acquire(jobs[0])
+    merge_reports([tmp_path / "0.json", tmp_path / "1.json"], tmp_path / "all.json")
+    assert len(json.loads((tmp_path / "all.json").read_text())["failed"]) == 1
+
+
+def test_retries_under_lease(tmp_path: Path) -> None:
+    """A retried unit keeps its lease until it succeeds."""
+    attempts: list[tuple] = []
+
+    def flaky(*args: str) -> None:
+        attempts.append(args)
+        assert LeaseDir(tmp_path).is_expired(args) is False
+        if len(attempts) == 1:
+            raise requests.ConnectionError("phony")
+
+    result = run_leased(flaky, jobs[:1], tmp_path, retries=1, backoff=0)
+    assert attempts == jobs[:1] * 2
+    assert result.completed == jobs[:1]
+    assert not result.failed
+
+
+def test_merges_reports(tmp_path: Path) -> None:
+    """It combines the reports of several nodes."""
+    for i in range(2):
+        (tmp_path / f"{i}.json").write_text(
+            json.dumps({"completed": 2, "skipped": [], "failed": [{"error": "x"}]})
+        )
+    merge_reports([tmp_path / "0.json", tmp_path / "1.json"], tmp_path / "all.json")
+    combined = json.loads((tmp_path / "all.json").read_text())
+    assert combined["completed"] == 4
+    assert len(combined["failed"]) == 2